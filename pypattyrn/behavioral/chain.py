@@ -1,4 +1,20 @@
 from abc import ABCMeta, abstractmethod
+from asyncio import get_running_loop, wait_for, TimeoutError as AsyncTimeoutError
+from collections import OrderedDict, deque
+from itertools import islice
+from time import perf_counter
+
+
+class _NotHandled(object):
+    """
+    Type of the NOT_HANDLED sentinel.
+    """
+    def __repr__(self):
+        return 'NOT_HANDLED'
+
+
+# Returned by a ChainLink which did not handle a request.
+NOT_HANDLED = _NotHandled()
 
 
 class ChainLink(object, metaclass=ABCMeta):
@@ -8,12 +24,32 @@ class ChainLink(object, metaclass=ABCMeta):
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#chain-of-responsibility-pattern}
     - External Chain of Responsibility Pattern documentation: U{https://en.wikipedia.org/wiki/Chain-of-responsibility_pattern}
     """
+    routing_keys = None
+    routing_types = None
+    commutative = False
+
     def __init__(self):
         """
         Initialize a new ChainLink instance.
+
+        Links used in a compiled chain can set routing_keys to the route keys of the requests they may handle, and
+        routing_types to a tuple of the request types they may handle, so the chain skips them for other requests.
+        Links which never handle the same request as a neighbouring commutative link can set commutative so an
+        adaptive chain may reorder them.
         """
         self.successor = None
 
+    def accepts(self, request):
+        """
+        Cheap check of whether this link might handle a request, used by routed chains to skip calling handle.
+
+        Must never return False for a request handle would handle. The default accepts every request.
+
+        @param request: The request to check.
+        @return: False if this link will not handle the request, True otherwise.
+        """
+        return True
+
     def set_successor(self, successor):
         """
         Set a chain link to call if this chain link fails.
@@ -31,6 +67,17 @@ class ChainLink(object, metaclass=ABCMeta):
         """
         return self.successor.handle(request)
 
+    def handle_batch(self, requests):
+        """
+        Handle a batch of requests, used by Chain.handle_many. Override to handle a batch with bulk operations.
+
+        The default calls handle for each request.
+
+        @param requests: The list of requests to handle.
+        @return: A list of results in the order of requests, holding NOT_HANDLED for requests this link did not handle.
+        """
+        return [self.handle(request) for request in requests]
+
     @abstractmethod
     def handle(self, request):
         """
@@ -41,20 +88,172 @@ class ChainLink(object, metaclass=ABCMeta):
         pass
 
 
+class _EndLink(ChainLink):
+    """
+    Successor given to every link of a compiled chain, ending the walk of a link without recursing.
+    """
+    def handle(self, request):
+        return NOT_HANDLED
+
+
+_END = _EndLink()
+
+
+class ChainMetrics(object):
+    """
+    Sink for Chain metrics.
+
+    This base implementation ignores everything, subclasses override the methods to collect or export metrics.
+    """
+    def record_link(self, link, handled, elapsed):
+        """
+        Record a link being asked to handle a request.
+
+        @param link: The link asked to handle the request.
+        @type link: ChainLink
+        @param handled: True if the link handled the request.
+        @type handled: bool
+        @param elapsed: Seconds spent in the handle method of the link.
+        @type elapsed: float
+        """
+        pass
+
+
+class ChainStats(ChainMetrics):
+    """
+    ChainMetrics sink aggregating per-link counters in memory, keyed by link.
+    """
+    def __init__(self):
+        """
+        Initialize a new ChainStats instance.
+        """
+        self.seen = {}
+        self.handled = {}
+        self.time = {}
+
+    def record_link(self, link, handled, elapsed):
+        self.seen[link] = self.seen.get(link, 0) + 1
+        if handled:
+            self.handled[link] = self.handled.get(link, 0) + 1
+        self.time[link] = self.time.get(link, 0.0) + elapsed
+
+
 class Chain(object, metaclass=ABCMeta):
     """
     Abstract Chain class as part of the Chain of Responsibility pattern.
 
+    A compiled chain flattens its links into a tuple and walks them in a loop instead of each link calling its
+    successor, so long chains do not grow the stack. A link which does not handle a request returns NOT_HANDLED,
+    either directly or through successor_handle. Compiling a chain detaches its links from each other, so they should
+    only be used through the chain afterwards.
+
+    When any link of a compiled chain declares routing keys, types or an accepts predicate the chain is routed: it
+    indexes its links by routing key and a request only visits the links which might handle it, still in chain order.
+    The key of a request is given by route_key.
+
+    A chain given a metrics sink reports every link asked to handle a request to it. An adaptive chain counts how
+    often each link handles a request and every adaptive requests sorts each run of neighbouring commutative links by
+    that count, most frequent first, halving the counts afterwards so the order follows changes in traffic. A chain
+    with metrics or adaptive is always compiled.
+
+    A chain given a cache_size remembers which link handled each of its most recently seen request keys, given by
+    cache_key, and hands a repeated request straight to that link, falling back to a walk if it no longer handles it.
+    Requests no link handled are remembered too. With cache_results the result is remembered as well and returned
+    without calling the link, which is only correct for links whose handle is pure. Cache hits are not reported to
+    metrics. A cached chain is always compiled.
+
+    handle_many hands a compiled chain's links whole batches of requests through handle_batch, each link passing the
+    requests it did not handle on to the next one as a smaller batch.
+
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#chain-of-responsibility-pattern}
     - External Chain of Responsibility Pattern documentation: U{https://en.wikipedia.org/wiki/Chain-of-responsibility_pattern}
     """
-    def __init__(self, chainlink):
+    def __init__(self, chainlink, compiled=False, metrics=None, adaptive=None, cache_size=None, cache_results=False):
         """
         Initialize a new Chain instance.
 
         @param chainlink: The starting chain link.
+        @param compiled: Whether to compile the chain straight away.
+        @type compiled: bool
+        @param metrics: An optional sink for per-link metrics.
+        @type metrics: ChainMetrics
+        @param adaptive: The number of requests between reorderings of commutative links, or None to keep the order.
+        @type adaptive: int
+        @param cache_size: The number of request keys to remember the handling link of, or None for no cache.
+        @type cache_size: int
+        @param cache_results: Whether to remember results as well as handling links.
+        @type cache_results: bool
         """
         self.chainlink = chainlink
+        self.metrics = metrics
+        self.adaptive = adaptive
+        self._links = None
+        self._routes = None
+        self._unkeyed = None
+        self._hits = {}
+        self._requests = 0
+        self.cache_size = cache_size
+        self.cache_results = cache_results
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = None if cache_size is None else OrderedDict()
+        if compiled or metrics is not None or adaptive is not None or cache_size is not None:
+            self.compile()
+
+    def compile(self):
+        """
+        Flatten the links of this chain into a tuple, walked iteratively when handling requests.
+        """
+        if self._links is not None:
+            return
+        links = []
+        link = self.chainlink
+        while link is not None and link is not _END:
+            links.append(link)
+            link = link.successor
+        for link in links:
+            link.successor = _END
+        self._index(links)
+
+    def _index(self, links):
+        """
+        Store the flattened links of this chain, indexing them by routing key if any link declares routing.
+
+        @param links: The links of the chain in order.
+        """
+        self._links = tuple(links)
+        self._routes = None
+        if any(link.routing_keys is not None or link.routing_types is not None or
+               type(link).accepts is not ChainLink.accepts for link in links):
+            keys = {key for link in links if link.routing_keys is not None for key in link.routing_keys}
+            self._routes = {key: tuple(link for link in links if link.routing_keys is None or key in link.routing_keys)
+                            for key in keys}
+            self._unkeyed = tuple(link for link in links if link.routing_keys is None)
+
+    def route_key(self, request):
+        """
+        Get the key a routed chain looks up a request by. The default is the request itself.
+
+        @param request: The request to get the key of.
+        @return: A hashable key.
+        """
+        return request
+
+    def cache_key(self, request):
+        """
+        Get the key a cached chain remembers a request by. The default is the request itself.
+
+        @param request: The request to get the key of.
+        @return: A hashable key.
+        """
+        return request
+
+    def clear_cache(self):
+        """
+        Forget every cached decision and result, for when the links of this chain change what they handle.
+        """
+        if self._cache is not None:
+            self._cache.clear()
 
     def handle(self, request):
         """
@@ -62,10 +261,331 @@ class Chain(object, metaclass=ABCMeta):
 
         @param request: The request to handle.
         """
+        if self._links is None:
+            try:
+                result = self.chainlink.handle(request)
+            except AttributeError:
+                return self.fail()
+            return self.fail() if result is NOT_HANDLED else result
+
+        if self._cache is not None:
+            return self._cached(request)
+        link, result = self._dispatch(request)
+        return self.fail() if link is None else result
+
+    def handle_many(self, requests):
+        """
+        Handle many requests, giving each link of a compiled chain the requests left unhandled as one batch.
+
+        Uncompiled chains, and chains with metrics, adaptive reordering or a cache, handle each request in turn.
+
+        @param requests: An iterable of requests to handle.
+        @return: A list of results in the order of requests.
+        """
+        requests = list(requests)
+        if self._links is None or self.metrics is not None or self.adaptive is not None or self._cache is not None:
+            return [self.handle(request) for request in requests]
+
+        candidates = None
+        if self._routes is not None:
+            sets = {}
+            candidates = []
+            for request in requests:
+                try:
+                    links = self._routes.get(self.route_key(request), self._unkeyed)
+                except TypeError:
+                    links = self._links
+                if id(links) not in sets:
+                    sets[id(links)] = frozenset(links)
+                candidates.append(sets[id(links)])
+
+        results = [NOT_HANDLED] * len(requests)
+        pending = list(range(len(requests)))
+        for link in self._links:
+            if not pending:
+                break
+            if candidates is None:
+                batch = pending
+            else:
+                batch = [index for index in pending
+                         if link in candidates[index] and self._may_handle(link, requests[index])]
+                if not batch:
+                    continue
+
+            unhandled = []
+            for index, result in zip(batch, link.handle_batch([requests[index] for index in batch])):
+                if result is NOT_HANDLED:
+                    unhandled.append(index)
+                else:
+                    results[index] = result
+            if batch is pending:
+                pending = unhandled
+            else:
+                handled = set(batch).difference(unhandled)
+                pending = [index for index in pending if index not in handled]
+
+        for index in pending:
+            results[index] = self.fail()
+        return results
+
+    def _cached(self, request):
+        """
+        Handle a request through the decision cache.
+
+        @param request: The request to handle.
+        """
+        try:
+            key = self.cache_key(request)
+            entry = self._cache.get(key)
+        except TypeError:
+            link, result = self._dispatch(request)
+            return self.fail() if link is None else result
+
+        if entry is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            link, result = entry
+            if link is _END:
+                return self.fail()
+            if result is NOT_HANDLED:
+                result = link.handle(request)
+            if result is not NOT_HANDLED:
+                return result
+
+        link, result = self._dispatch(request)
+        self._cache[key] = (_END if link is None else link, result if self.cache_results else NOT_HANDLED)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return self.fail() if link is None else result
+
+    def _dispatch(self, request):
+        """
+        Walk the links of a compiled chain which might handle a request.
+
+        @param request: The request to handle.
+        @return: A tuple of the link which handled the request and its result, or of None and NOT_HANDLED.
+        """
+        if self._routes is None:
+            links = self._links
+        else:
+            try:
+                links = self._routes.get(self.route_key(request), self._unkeyed)
+            except TypeError:
+                links = self._links
+
+        if self.metrics is not None or self.adaptive is not None:
+            return self._observe(links, request)
+
+        if self._routes is None:
+            for link in links:
+                result = link.handle(request)
+                if result is not NOT_HANDLED:
+                    return link, result
+        else:
+            for link in links:
+                if self._may_handle(link, request):
+                    result = link.handle(request)
+                    if result is not NOT_HANDLED:
+                        return link, result
+        return None, NOT_HANDLED
+
+    @staticmethod
+    def _may_handle(link, request):
+        """
+        Check the routing types and accepts predicate of a link against a request.
+
+        @param link: The link to check.
+        @param request: The request to check.
+        @return: False if the link will not handle the request, True otherwise.
+        """
+        if link.routing_types is not None and not isinstance(request, link.routing_types):
+            return False
+        return link.accepts(request)
+
+    def _observe(self, links, request):
+        """
+        Walk links with a request, reporting each link to the metrics sink and counting hits for adaptive reordering.
+
+        @param links: The candidate links for the request in chain order.
+        @param request: The request to handle.
+        @return: A tuple of the link which handled the request and its result, or of None and NOT_HANDLED.
+        """
+        routed = self._routes is not None
+        result = NOT_HANDLED
+        for link in links:
+            if routed and not self._may_handle(link, request):
+                continue
+            start = perf_counter()
+            result = link.handle(request)
+            if self.metrics is not None:
+                self.metrics.record_link(link, result is not NOT_HANDLED, perf_counter() - start)
+            if result is not NOT_HANDLED:
+                break
+
+        if self.adaptive is not None:
+            if result is not NOT_HANDLED:
+                self._hits[link] = self._hits.get(link, 0) + 1
+            self._requests += 1
+            if self._requests >= self.adaptive:
+                self._reorder()
+        return (None, result) if result is NOT_HANDLED else (link, result)
+
+    def _reorder(self):
+        """
+        Sort each run of neighbouring commutative links by how often they handled a request, then decay the counts.
+        """
+        self._requests = 0
+        links = list(self._links)
+        start = 0
+        while start < len(links):
+            end = start
+            while end < len(links) and links[end].commutative:
+                end += 1
+            if end > start:
+                links[start:end] = sorted(links[start:end], key=lambda link: -self._hits.get(link, 0))
+            start = end + 1
+        self._hits = {link: hits // 2 for link, hits in self._hits.items() if hits > 1}
+        self._index(links)
+
+    @abstractmethod
+    def fail(self):
+        """
+        The method to call when the chain could not handle a request.
+        """
+        pass
+
+
+class AsyncChainLink(ChainLink):
+    """
+    Abstract ChainLink whose handle is a coroutine, as part of an AsyncChain.
+
+    A link which does not handle a request returns NOT_HANDLED, either directly or by awaiting successor_handle. A
+    link can set timeout to the number of seconds its handle may take before the chain moves on without it.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#chain-of-responsibility-pattern}
+    - External Chain of Responsibility Pattern documentation: U{https://en.wikipedia.org/wiki/Chain-of-responsibility_pattern}
+    """
+    timeout = None
+
+    async def successor_handle(self, request):
+        """
+        Have this chain links successor handle a request.
+
+        @param request: The request to handle.
+        """
+        return await self.successor.handle(request)
+
+    @abstractmethod
+    async def handle(self, request):
+        """
+        Handle a request.
+
+        @param request: The request to handle.
+        """
+        pass
+
+
+class _AsyncEndLink(AsyncChainLink):
+    """
+    Successor given to every link of an AsyncChain.
+    """
+    async def handle(self, request):
+        return NOT_HANDLED
+
+
+_ASYNC_END = _AsyncEndLink()
+
+
+class AsyncChain(object, metaclass=ABCMeta):
+    """
+    Abstract asyncio Chain class as part of the Chain of Responsibility pattern.
+
+    Links are flattened like a compiled Chain and awaited one at a time in chain order. A link which times out is
+    treated as not handling the request. In speculative mode up to speculate links after the one being awaited run
+    concurrently with it; the earliest link in chain order which handles the request wins and the links still running
+    are cancelled, so handlers should not have side effects they cannot abandon.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#chain-of-responsibility-pattern}
+    - External Chain of Responsibility Pattern documentation: U{https://en.wikipedia.org/wiki/Chain-of-responsibility_pattern}
+    """
+    def __init__(self, chainlink, timeout=None, speculate=0):
+        """
+        Initialize a new AsyncChain instance.
+
+        @param chainlink: The starting chain link.
+        @param timeout: The default number of seconds a link may take to handle a request, or None to wait forever.
+        @type timeout: float
+        @param speculate: The number of links to run ahead of the link being awaited.
+        @type speculate: int
+        """
+        self.chainlink = chainlink
+        self.timeout = timeout
+        self.speculate = speculate
+
+        links = []
+        link = chainlink
+        while link is not None and link is not _ASYNC_END:
+            links.append(link)
+            link = link.successor
+        for link in links:
+            link.successor = _ASYNC_END
+        self._links = tuple(links)
+
+    async def handle(self, request):
+        """
+        Handle a request.
+
+        @param request: The request to handle.
+        """
+        if self.speculate:
+            return await self._speculate(request)
+
+        for link in self._links:
+            result = await self._attempt(link, request)
+            if result is not NOT_HANDLED:
+                return result
+        return self.fail()
+
+    async def _speculate(self, request):
+        """
+        Handle a request while running links ahead of the one being awaited.
+
+        @param request: The request to handle.
+        """
+        loop = get_running_loop()
+        links = iter(self._links)
+        pending = deque(loop.create_task(self._attempt(link, request))
+                        for link in islice(links, self.speculate + 1))
+        try:
+            while pending:
+                result = await pending.popleft()
+                if result is not NOT_HANDLED:
+                    return result
+                for link in islice(links, 1):
+                    pending.append(loop.create_task(self._attempt(link, request)))
+        finally:
+            for task in pending:
+                if not task.cancel() and not task.cancelled():
+                    task.exception()
+        return self.fail()
+
+    async def _attempt(self, link, request):
+        """
+        Have a link handle a request within its timeout.
+
+        @param link: The link to handle the request.
+        @param request: The request to handle.
+        @return: The result of the link, or NOT_HANDLED if it timed out.
+        """
+        timeout = self.timeout if link.timeout is None else link.timeout
+        if timeout is None:
+            return await link.handle(request)
         try:
-            return self.chainlink.handle(request)
-        except AttributeError:
-            return self.fail()
+            return await wait_for(link.handle(request), timeout)
+        except AsyncTimeoutError:
+            return NOT_HANDLED
 
     @abstractmethod
     def fail(self):
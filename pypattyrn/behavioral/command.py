@@ -1,13 +1,79 @@
 from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from inspect import isfunction
+from math import ceil
+from mmap import mmap, ACCESS_READ
+from os import fsync, replace, truncate
+from os.path import exists, getsize
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from struct import Struct
+from sys import getsizeof
+from threading import BoundedSemaphore, Event, Lock, Thread
+from time import monotonic
+from traceback import print_exception
+from zlib import crc32
 
+_FRAME_HEADER = Struct('<II')
+_SNAPSHOT_HEADER = Struct('<Q')
 
-class Receiver(object, metaclass=ABCMeta):
+
+def _estimate_size(command):
+    """
+    Estimate the memory held by a command, counting the command, its attribute dict and the attribute values.
+
+    @param command: The command to estimate the size of.
+    @return: The estimated size in bytes.
+    """
+    attributes = getattr(command, '__dict__', {})
+    return getsizeof(command) + getsizeof(attributes) + sum(getsizeof(value) for value in attributes.values())
+
+
+class _ReceiverMeta(ABCMeta):
+    """
+    Metaclass of Receiver, keeping the table of methods actions are dispatched to in step with the class.
+
+    The table is built when a class is defined and rebuilt for the class and its subclasses whenever an attribute of
+    the class is set or deleted, for example by mock.patch.object.
+    """
+    def __init__(cls, name, bases, namespace, **kwargs):
+        super().__init__(name, bases, namespace, **kwargs)
+        cls._build_actions()
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        if name != '_actions':
+            cls._build_actions()
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        cls._build_actions()
+
+    def _build_actions(cls):
+        """
+        Build the action table of this class and rebuild those of its subclasses.
+        """
+        actions = dict()
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isfunction(value):
+                    actions[name] = value
+                else:
+                    actions.pop(name, None)
+        type.__setattr__(cls, '_actions', actions)
+        for subclass in type.__subclasses__(cls):
+            subclass._build_actions()
+
+
+class Receiver(object, metaclass=_ReceiverMeta):
     """
     Abstract receiver class as part of the Command pattern.
 
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#command-pattern}
     - External Command Pattern documentation: U{https://en.wikipedia.org/wiki/Command_pattern}
     """
+
     def action(self, name, *args, **kwargs):
         """
         Delegates which method to be called for a desired action.
@@ -17,10 +83,15 @@ class Receiver(object, metaclass=ABCMeta):
         @param args: Any arguments for the action.
         @param kwargs: Any keyword arguments for the action.
         """
+        method = self._actions.get(name)
+        if method is not None and name not in getattr(self, '__dict__', ()):
+            return method(self, *args, **kwargs)
+
         try:
-            return getattr(self, name)(*args, **kwargs)
+            method = getattr(self, name)
         except AttributeError:
             raise AttributeError('Invalid Action.')
+        return method(*args, **kwargs)
 
 
 class Command(object, metaclass=ABCMeta):
@@ -53,6 +124,115 @@ class Command(object, metaclass=ABCMeta):
         """
         pass
 
+    def coalesce(self, other):
+        """
+        Merge this command with the command executed right after it in a batch.
+
+        Override this for commands where two adjacent commands can be replaced by one, the default never merges.
+
+        @param other: The command following this one.
+        @type other: Command
+        @return: A single command with the effect of both, or None if they can not be merged.
+        """
+        return None
+
+    def reads(self):
+        """
+        The resources this command reads, used to decide which commands of a batch may run in parallel.
+
+        @return: An iterable of hashable resources. The default is no resources.
+        """
+        return ()
+
+    def writes(self):
+        """
+        The resources this command writes, used to decide which commands of a batch may run in parallel.
+
+        @return: An iterable of hashable resources. The default is the receiver of this command.
+        """
+        return self._receiver,
+
+    def to_delta(self):
+        """
+        Encode this command as a compact delta to store in an invokers undo and redo stacks instead of the command.
+
+        Override this together with from_delta for commands which are cheaper to store as a few values. The default
+        returns None, storing the command itself.
+
+        @return: A compact picklable value which from_delta can rebuild this command from, or None.
+        """
+        return None
+
+    @classmethod
+    def from_delta(cls, receiver, delta):
+        """
+        Rebuild a command from a delta returned by to_delta.
+
+        @param receiver: The receiver of the encoded command.
+        @type receiver: Receiver
+        @param delta: The value returned by to_delta.
+        @return: A new command equivalent to the encoded one.
+        """
+        raise NotImplementedError('from_delta must be overridden along with to_delta')
+
+
+class MacroCommand(Command):
+    """
+    Command which executes a sequence of commands as a single atomic unit.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#command-pattern}
+    - External Command Pattern documentation: U{https://en.wikipedia.org/wiki/Command_pattern}
+    """
+    def __init__(self, commands):
+        """
+        Initialize a new MacroCommand instance.
+
+        @param commands: The commands to execute, in order.
+        @type commands: list
+        """
+        super().__init__(None)
+        self.commands = commands
+
+    def execute(self):
+        """
+        Execute every command in order, unexecuting the ones already executed if any of them fails.
+
+        @return: A list of the results of the commands.
+        """
+        results = []
+        for index, command in enumerate(self.commands):
+            try:
+                results.append(command.execute())
+            except BaseException:
+                for executed in reversed(self.commands[:index]):
+                    executed.unexecute()
+                raise
+        return results
+
+    def unexecute(self):
+        """
+        Unexecute every command in reverse order.
+
+        @return: A list of the results of unexecuting the commands, in the order they were unexecuted.
+        """
+        return [command.unexecute() for command in reversed(self.commands)]
+
+    def reads(self):
+        """
+        The resources read by any of the commands.
+
+        @return: A list of the resources read by the commands, in order.
+        """
+        return [resource for command in self.commands for resource in command.reads()]
+
+    def writes(self):
+        """
+        The resources written by any of the commands.
+
+        @return: A list of the resources written by the commands, in order.
+        """
+        return [resource for command in self.commands for resource in command.writes()]
+
 
 class Invoker(object, metaclass=ABCMeta):
     """
@@ -61,14 +241,43 @@ class Invoker(object, metaclass=ABCMeta):
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#command-pattern}
     - External Command Pattern documentation: U{https://en.wikipedia.org/wiki/Command_pattern}
     """
-    def __init__(self, valid_commands):
+    def __init__(self, valid_commands, max_history=None, max_history_bytes=None, on_evict=None, compactor=None,
+                 size_of=None, journal=None):
         """
         Initialize a new Invoker instance.
 
-        @param valid_commands: A list of command classes this invoker can handle.
+        Commands whose to_delta method returns a delta are stored in the undo and redo stacks as a compact
+        (class, receiver, delta) tuple, and rebuilt with from_delta when they are undone or redone. Commands are
+        encoded after they are executed or unexecuted, so the delta can hold state captured while executing.
+
+        The history of executed commands can be bounded by a number of entries and by an estimated number of bytes.
+        When it grows past a bound the oldest entries are evicted, or merged into a checkpoint if a compactor is
+        given, so the most recent commands can always be undone.
+
+        @param valid_commands: A list of command classes this invoker can handle, including their subclasses.
+        @param max_history: The maximum number of entries to keep in the history, or None for no limit.
+        @type max_history: int
+        @param max_history_bytes: The maximum estimated size of the history in bytes, or None for no limit.
+        @type max_history_bytes: int
+        @param on_evict: A callable called with each command evicted from the history.
+        @param compactor: A callable which merges a list of the two oldest history entries into a single checkpoint
+                          command, whose unexecute undoes both.
+        @param size_of: A callable estimating the size of a command in bytes. Defaults to a shallow estimate.
+        @param journal: A journal to append every successfully executed command to.
+        @type journal: CommandJournal
         """
-        self._history = []
+        self._history = deque()
         self._valid_commands = valid_commands
+        self._validated = dict()
+        self._max_history = max_history
+        self._max_history_bytes = max_history_bytes
+        self._on_evict = on_evict
+        self._compactor = compactor
+        self._size_of = _estimate_size if size_of is None else size_of
+        self._history_sizes = deque()
+        self._history_bytes = 0
+        self._redo = deque()
+        self._journal = journal
 
     def execute(self, command):
         """
@@ -77,14 +286,1025 @@ class Invoker(object, metaclass=ABCMeta):
         @param command: A command for the invoker to execute.
         @type command: Command
         """
-        if command.__class__ not in self._valid_commands:
+        self._validate(command.__class__)
+        if self._journal is not None:
+            self._journal.check(command)
+        result = command.execute()
+        self._redo.clear()
+        self._record(command)
+        if self._journal is not None:
+            self._journal.append(command)
+        return result
+
+    def execute_batch(self, commands):
+        """
+        Execute a batch of commands as a single atomic unit, which is undone as a single history entry.
+
+        Adjacent commands are merged first where their coalesce method allows it. If any command fails the commands
+        already executed are unexecuted, nothing is added to the history and the error is raised. An empty batch adds
+        nothing to the history.
+
+        @param commands: The commands for the invoker to execute, in order.
+        @type commands: list
+        @return: A list of the results of the commands that remained after merging.
+        """
+        merged = self._prepare_batch(commands)
+        if not merged:
+            return []
+        batch = MacroCommand(merged)
+        if self._journal is not None:
+            self._journal.check(batch)
+        results = batch.execute()
+        self._record_batch(batch)
+        return results
+
+    def undo(self):
+        """
+        Undo the last command, making it available to redo.
+        """
+        command = self._pop_history()
+        result = command.unexecute()
+        self._redo.append(self._encode(command))
+        if self._journal is not None:
+            self._journal.append(command, undo=True)
+        return result
+
+    def redo(self):
+        """
+        Redo the last undone command. Executing a new command discards every undone command.
+        """
+        command = self._decode(self._redo.pop())
+        if self._journal is not None:
+            self._journal.check(command)
+        result = command.execute()
+        self._record(command)
+        if self._journal is not None:
+            self._journal.append(command)
+        return result
+
+    def replay(self, receiver):
+        """
+        Rebuild a receivers state from this invokers journal.
+
+        The history is not rebuilt, so replayed commands can not be undone.
+
+        @param receiver: The receiver to replay commands on if the journal has no snapshot.
+        @type receiver: Receiver
+        @return: The rebuilt receiver.
+        """
+        return self._journal.replay(receiver)
+
+    def _validate(self, command_class):
+        """
+        Check that a command class is one of the valid commands or a subclass of one, caching the answer per class.
+
+        @param command_class: The class of the command to check.
+        @raise AttributeError: If the command class is not valid for this invoker.
+        """
+        try:
+            valid = self._validated[command_class]
+        except KeyError:
+            valid = self._validated[command_class] = issubclass(command_class, tuple(self._valid_commands))
+        if not valid:
             raise AttributeError('Invalid Command')
+
+    def _prepare_batch(self, commands):
+        """
+        Validate a batch of commands once per class and merge adjacent commands where they allow it.
+
+        @param commands: The commands of the batch, in order.
+        @type commands: list
+        @return: The merged list of commands.
+        @raise AttributeError: If any command is not valid for this invoker.
+        """
+        for command_class in {command.__class__ for command in commands}:
+            self._validate(command_class)
+
+        merged = []
+        for command in commands:
+            combined = merged[-1].coalesce(command) if merged else None
+            if combined is None:
+                merged.append(command)
+            else:
+                merged[-1] = combined
+        return merged
+
+    def _record_batch(self, batch):
+        """
+        Record an executed batch in the history as a single entry and journal its commands.
+
+        @param batch: The executed batch.
+        @type batch: MacroCommand
+        """
+        self._redo.clear()
+        self._record(batch)
+        if self._journal is not None:
+            self._journal.append(batch)
+
+    def _record(self, command, encode=True):
+        """
+        Add a command to the history, evicting or compacting the oldest entries if the history is over its bounds.
+
+        @param command: The command to add.
+        @type command: Command
+        @param encode: Whether to encode the command, or to store it as it is until it has been executed.
+        @type encode: bool
+        """
+        entry = self._encode(command) if encode else command
+        size = self._size_of(entry) if self._max_history_bytes is not None else 0
+        self._history.append(entry)
+        self._history_sizes.append(size)
+        self._history_bytes += size
+
+        while self._over_budget():
+            oldest = self._decode(self._history.popleft())
+            self._history_bytes -= self._history_sizes.popleft()
+            if self._compactor is not None and self._history:
+                checkpoint = self._compactor([oldest, self._decode(self._history.popleft())])
+                self._history_bytes -= self._history_sizes.popleft()
+                size = self._size_of(checkpoint) if self._max_history_bytes is not None else 0
+                self._history.appendleft(checkpoint)
+                self._history_sizes.appendleft(size)
+                self._history_bytes += size
+            elif self._on_evict is not None:
+                self._on_evict(oldest)
+
+    def _pop_history(self):
+        """
+        Remove the last command from the history.
+
+        @return: The last command.
+        """
+        entry = self._history.pop()
+        self._history_bytes -= self._history_sizes.pop()
+        return self._decode(entry)
+
+    @staticmethod
+    def _encode(command):
+        """
+        Encode a command for the undo and redo stacks.
+
+        @param command: The command to encode.
+        @type command: Command
+        @return: A (class, receiver, delta) tuple if the command supports deltas, otherwise the command itself.
+        """
+        delta = command.to_delta()
+        if delta is None:
+            return command
+        return command.__class__, command._receiver, delta
+
+    @staticmethod
+    def _decode(entry):
+        """
+        Decode an entry of the undo or redo stacks.
+
+        @param entry: The entry to decode.
+        @return: The command the entry was encoded from.
+        """
+        if isinstance(entry, tuple):
+            command_class, receiver, delta = entry
+            return command_class.from_delta(receiver, delta)
+        return entry
+
+    def _over_budget(self):
+        """
+        @return: True if the history holds more entries or bytes than allowed.
+        """
+        return ((self._max_history is not None and len(self._history) > self._max_history) or
+                (self._max_history_bytes is not None and self._history_bytes > self._max_history_bytes))
+
+
+class ThreadedInvoker(Invoker):
+    """
+    Invoker which queues commands and executes them on a pool of workers.
+
+    Commands for the same receiver run one at a time in the order they were executed, while commands for different
+    receivers run in parallel. At most max_queued commands may be pending; executing more blocks until one finishes.
+
+    With a process pool, commands and their receivers are pickled to the worker process, so changes a command makes
+    to its receiver are not seen by the calling process.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#command-pattern}
+    - External Command Pattern documentation: U{https://en.wikipedia.org/wiki/Command_pattern}
+    """
+    def __init__(self, valid_commands, max_workers=None, max_queued=1024, executor=None, **kwargs):
+        """
+        Initialize a new ThreadedInvoker instance.
+
+        @param valid_commands: A list of command classes this invoker can handle.
+        @param max_workers: The number of worker threads to start if no executor is given.
+        @type max_workers: int
+        @param max_queued: The maximum number of commands which may be pending at once.
+        @type max_queued: int
+        @param executor: The thread or process pool executor to run commands on. Defaults to a new thread pool.
+        @type executor: concurrent.futures.Executor
+        @param kwargs: Any keyword arguments accepted by Invoker.
+        """
+        super().__init__(valid_commands, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers) if executor is None else executor
+        self._slots = BoundedSemaphore(max_queued)
+        self._lanes = dict()
+        self._lock = Lock()
+
+    def execute(self, command, timeout=None):
+        """
+        Queue a command for execution.
+
+        @param command: A command for the invoker to execute.
+        @type command: Command
+        @param timeout: The maximum number of seconds to wait for room in the queue, or None to wait forever.
+        @type timeout: float
+        @return: A future resolving to the result of the command.
+        @rtype: concurrent.futures.Future
+        @raise TimeoutError: If the queue stayed full until the timeout expired.
+        """
+        self._validate(command.__class__)
+        if self._journal is not None:
+            self._journal.check(command)
+        self._reserve(timeout)
+        return self._submit(command, command.execute, True, True)
+
+    def execute_batch(self, commands, timeout=None):
+        """
+        Queue a batch of commands for execution as a single atomic unit, which is undone as a single history entry.
+
+        The batch runs in the lane of its receiver, so every command of the batch must be for the same receiver.
+
+        @param commands: The commands for the invoker to execute, in order.
+        @type commands: list
+        @param timeout: The maximum number of seconds to wait for room in the queue, or None to wait forever.
+        @type timeout: float
+        @return: A future resolving to a list of the results of the commands that remained after merging.
+        @rtype: concurrent.futures.Future
+        @raise ValueError: If the commands are for more than one receiver.
+        @raise TimeoutError: If the queue stayed full until the timeout expired.
+        """
+        merged = self._prepare_batch(commands)
+        if not merged:
+            future = Future()
+            future.set_result([])
+            return future
+        if len({id(command._receiver) for command in merged}) > 1:
+            raise ValueError('Every command of a ThreadedInvoker batch must be for the same receiver')
+
+        batch = MacroCommand(merged)
+        batch._receiver = merged[0]._receiver
+        if self._journal is not None:
+            self._journal.check(batch)
+        self._reserve(timeout)
+        return self._submit(batch, batch.execute, True, True)
+
+    def undo(self, timeout=None):
+        """
+        Queue the undoing of the last command, after any pending commands for its receiver.
+
+        @param timeout: The maximum number of seconds to wait for room in the queue, or None to wait forever.
+        @type timeout: float
+        @return: A future resolving to the result of unexecuting the command.
+        @rtype: concurrent.futures.Future
+        @raise TimeoutError: If the queue stayed full until the timeout expired.
+        """
+        self._reserve(timeout)
+        try:
+            with self._lock:
+                command = self._pop_history()
+                self._redo.append(command)
+        except BaseException:
+            self._slots.release()
+            raise
+        return self._submit(command, command.unexecute, False, undo=True)
+
+    def redo(self, timeout=None):
+        """
+        Queue the redoing of the last undone command, after any pending commands for its receiver.
+
+        @param timeout: The maximum number of seconds to wait for room in the queue, or None to wait forever.
+        @type timeout: float
+        @return: A future resolving to the result of executing the command.
+        @rtype: concurrent.futures.Future
+        @raise TimeoutError: If the queue stayed full until the timeout expired.
+        """
+        self._reserve(timeout)
+        try:
+            with self._lock:
+                command = self._decode(self._redo.pop())
+        except BaseException:
+            self._slots.release()
+            raise
+        return self._submit(command, command.execute, True)
+
+    def shutdown(self, wait=True):
+        """
+        Shut down the executor running the commands.
+
+        @param wait: Whether to wait for every pending command to finish.
+        @type wait: bool
+        """
+        self._executor.shutdown(wait)
+
+    def _reserve(self, timeout):
+        """
+        Take a slot in the queue, before the history or redo stack is changed for the call it is taken for.
+
+        @param timeout: The maximum number of seconds to wait for room in the queue, or None to wait forever.
+        @type timeout: float
+        @raise TimeoutError: If the queue stayed full until the timeout expired.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError('The command queue is full')
+
+    def _submit(self, command, call, record, clear_redo=False, undo=False):
+        """
+        Queue a call in its receivers lane, starting it straight away if the lane is idle. The caller must have
+        reserved a slot in the queue for it.
+
+        @param command: The command the call belongs to.
+        @type command: Command
+        @param call: The bound execute or unexecute method to call.
+        @param record: Whether to record the command in the history.
+        @type record: bool
+        @param clear_redo: Whether to discard every undone command.
+        @type clear_redo: bool
+        @param undo: Whether the call undoes the command, journaling it as undone once it succeeds.
+        @type undo: bool
+        @return: A future resolving to the result of the call.
+        """
+        future = Future()
+        key = id(command._receiver)
+        item = (command, call, future, undo)
+        with self._lock:
+            if clear_redo:
+                self._redo.clear()
+            if record:
+                self._record(command, encode=False)
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append(item)
+                return future
+            self._lanes[key] = deque()
+
+        self._start(key, item)
+        return future
+
+    def _start(self, key, item):
+        """
+        Run the next call of a lane on the executor, skipping calls whose futures were cancelled and failing calls
+        the executor refuses, for example after shutdown. Skipped and failed calls are taken back out of the history.
+
+        @param key: The lane of the receiver.
+        @param item: The (command, call, future, undo) tuple to run.
+        """
+        while item is not None:
+            command, call, future, undo = item
+            error = None
+            if future.set_running_or_notify_cancel():
+                try:
+                    submitted = self._executor.submit(call)
+                except BaseException as submit_error:
+                    error = submit_error
+                else:
+                    submitted.add_done_callback(lambda done: self._complete(key, command, future, undo, done))
+                    return
+
+            with self._lock:
+                self._unrecord(command, undo)
+            self._slots.release()
+            item = self._next(key)
+            if error is not None:
+                future.set_exception(error)
+
+    def _complete(self, key, command, future, undo, done):
+        """
+        Pass on the outcome of a finished call and start the next call in its lane.
+
+        @param key: The lane of the receiver.
+        @param command: The command the call belonged to.
+        @param future: The future returned to the caller.
+        @param undo: Whether the call undid the command.
+        @param done: The executors finished future.
+        """
+        error = done.exception()
+        with self._lock:
+            if error is None:
+                self._seal(command, undo)
+                if self._journal is not None:
+                    self._journal.append(command, undo)
+            else:
+                self._unrecord(command, undo)
+
+        self._slots.release()
+        item = self._next(key)
+        if error is None:
+            future.set_result(done.result())
         else:
-            self._history.append(command)
-            return command.execute()
+            future.set_exception(error)
+        self._start(key, item)
 
-    def undo(self):
+    def _seal(self, command, undo):
+        """
+        Encode a command left as it is in the history or redo stack once its call has finished. Must hold the lock.
+
+        @param command: The command whose call finished.
+        @type command: Command
+        @param undo: Whether the command was unexecuted, and so is in the redo stack.
+        @type undo: bool
+        """
+        stack = self._redo if undo else self._history
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is command:
+                entry = stack[index] = self._encode(command)
+                if not undo and self._max_history_bytes is not None:
+                    size = self._size_of(entry)
+                    self._history_bytes += size - self._history_sizes[index]
+                    self._history_sizes[index] = size
+                return
+
+    def _unrecord(self, command, undo):
+        """
+        Take back the recording of a call which never ran. Must hold the lock.
+
+        An executed command is removed from the history, an undone command moved from the redo stack back onto it.
+
+        @param command: The command whose call never ran.
+        @type command: Command
+        @param undo: Whether the call would have unexecuted the command.
+        @type undo: bool
+        """
+        stack = self._redo if undo else self._history
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is command:
+                del stack[index]
+                if undo:
+                    self._record(command, encode=False)
+                else:
+                    self._history_bytes -= self._history_sizes[index]
+                    del self._history_sizes[index]
+                return
+
+    def _next(self, key):
+        """
+        Take the next call of a lane, closing the lane if it is empty.
+
+        @param key: The lane of the receiver.
+        @return: The next (command, call, future, undo) tuple, or None if the lane is empty.
+        """
+        with self._lock:
+            lane = self._lanes[key]
+            if lane:
+                return lane.popleft()
+            del self._lanes[key]
+            return None
+
+
+class ParallelInvoker(Invoker):
+    """
+    Invoker which runs the independent commands of a batch in parallel on a pool of workers.
+
+    Each command declares the resources it reads and writes. Two commands conflict if one writes a resource the other
+    reads or writes, and a command only starts once every earlier command it conflicts with has finished. By default
+    a command writes its receiver, so commands for the same receiver run in order and commands for different
+    receivers run in parallel. The batch is recorded in its logical order, so undoing it is deterministic.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#command-pattern}
+    - External Command Pattern documentation: U{https://en.wikipedia.org/wiki/Command_pattern}
+    """
+    def __init__(self, valid_commands, max_workers=None, executor=None, **kwargs):
+        """
+        Initialize a new ParallelInvoker instance.
+
+        @param valid_commands: A list of command classes this invoker can handle.
+        @param max_workers: The number of worker threads to start if no executor is given.
+        @type max_workers: int
+        @param executor: The executor to run commands on. Defaults to a new thread pool.
+        @type executor: concurrent.futures.Executor
+        @param kwargs: Any keyword arguments accepted by Invoker.
+        """
+        super().__init__(valid_commands, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers) if executor is None else executor
+
+    def execute_batch(self, commands):
+        """
+        Execute a batch of commands as a single atomic unit, running commands which do not conflict in parallel.
+
+        If any command fails, the running commands are waited for, every command that finished is unexecuted in
+        reverse order, nothing is added to the history and the first error in batch order is raised.
+
+        @param commands: The commands for the invoker to execute, in order.
+        @type commands: list
+        @return: A list of the results of the commands that remained after merging, in batch order.
+        """
+        merged = self._prepare_batch(commands)
+        if not merged:
+            return []
+        if self._journal is not None:
+            self._journal.check(MacroCommand(merged))
+        dependents, blockers = self._conflict_graph(merged)
+
+        results = [None] * len(merged)
+        errors = dict()
+        finished = set()
+        running = dict()
+        ready = [index for index, count in enumerate(blockers) if count == 0]
+        while ready or running:
+            for index in ready:
+                running[self._executor.submit(merged[index].execute)] = index
+            ready = []
+
+            done, pending = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    errors[index] = error
+                    continue
+                results[index] = future.result()
+                finished.add(index)
+                if not errors:
+                    for dependent in dependents[index]:
+                        blockers[dependent] -= 1
+                        if blockers[dependent] == 0:
+                            ready.append(dependent)
+            if errors:
+                ready = []
+
+        if errors:
+            for index in sorted(finished, reverse=True):
+                merged[index].unexecute()
+            raise errors[min(errors)]
+
+        self._record_batch(MacroCommand(merged))
+        return results
+
+    def shutdown(self, wait=True):
+        """
+        Shut down the executor running the commands.
+
+        @param wait: Whether to wait for every running command to finish.
+        @type wait: bool
+        """
+        self._executor.shutdown(wait)
+
+    @staticmethod
+    def _conflict_graph(commands):
         """
-        Undo the last command.
+        Build the graph of which commands must wait for which earlier commands.
+
+        Only the latest writer and the readers since then are tracked per resource, so building the graph is linear
+        in the number of declared resources.
+
+        @param commands: The commands of the batch, in order.
+        @type commands: list
+        @return: A (dependents, blockers) tuple. dependents holds the set of later commands waiting on each command,
+                 blockers the number of earlier commands each command waits on.
+        """
+        dependents = [set() for command in commands]
+        blockers = [0] * len(commands)
+        writers = dict()
+        readers = dict()
+        for index, command in enumerate(commands):
+            blocking = set()
+            for resource in command.reads():
+                if resource in writers:
+                    blocking.add(writers[resource])
+                readers.setdefault(resource, []).append(index)
+            for resource in command.writes():
+                if resource in writers:
+                    blocking.add(writers[resource])
+                blocking.update(readers.pop(resource, ()))
+                writers[resource] = index
+            blocking.discard(index)
+            for blocker in blocking:
+                dependents[blocker].add(index)
+            blockers[index] = len(blocking)
+        return dependents, blockers
+
+
+class ScheduledCommand(object):
+    """
+    Handle for a command scheduled on a CommandScheduler, used to cancel it.
+    """
+    __slots__ = ('command', 'due', 'interval', 'slot')
+
+    def __init__(self, command, due, interval):
+        """
+        Initialize a new ScheduledCommand instance.
+
+        @param command: The scheduled command.
+        @type command: Command
+        @param due: The tick the command is due on.
+        @type due: int
+        @param interval: The number of ticks between repeats, or None to run once.
+        @type interval: int
         """
-        return self._history.pop().unexecute()
+        self.command = command
+        self.due = due
+        self.interval = interval
+        self.slot = None
+
+
+class CommandScheduler(object):
+    """
+    Runs commands through an invoker after a delay or on an interval, using a hierarchical timer wheel.
+
+    Time is divided into ticks. Each level of the wheel has wheel_size slots, a slot on one level covering a whole
+    turn of the level below. Scheduling and cancelling a command are O(1), and commands far in the future are
+    cascaded down a level at a time as their time approaches.
+
+    Due commands are executed on the schedulers thread through the invoker. Use a ThreadedInvoker to run them on a
+    worker pool instead, errors of commands failing on the workers are still passed to on_error. How late commands
+    are handed to the invoker is tracked in lag_max and lag_mean; with a ThreadedInvoker this does not include the
+    time they wait in its queue.
+    """
+    def __init__(self, invoker, tick=0.01, wheel_size=256, levels=4, on_error=None):
+        """
+        Initialize a new CommandScheduler instance.
+
+        @param invoker: The invoker to execute due commands through.
+        @type invoker: Invoker
+        @param tick: The length of a tick in seconds.
+        @type tick: float
+        @param wheel_size: The number of slots on each level of the wheel, a power of two.
+        @type wheel_size: int
+        @param levels: The number of levels of the wheel.
+        @type levels: int
+        @param on_error: A callable called with the command and the error when a command fails. Defaults to printing
+                         the traceback.
+        @raise ValueError: If wheel_size is not a power of two.
+        """
+        if wheel_size < 2 or wheel_size & (wheel_size - 1):
+            raise ValueError('wheel_size must be a power of two')
+        self.invoker = invoker
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self.levels = levels
+        self.on_error = on_error
+        self.fired = 0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self._bits = wheel_size.bit_length() - 1
+        self._mask = wheel_size - 1
+        self._wheels = [[dict() for i in range(wheel_size)] for level in range(levels)]
+        self._overflow = dict()
+        self._current = 0
+        self._started = monotonic()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+
+    @property
+    def lag_mean(self):
+        """
+        @return: The mean number of seconds commands fired after they were due.
+        """
+        return self.lag_total / self.fired if self.fired else 0.0
+
+    def start(self):
+        """
+        Start the schedulers thread.
+        """
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the schedulers thread. Commands which have not fired yet stay scheduled.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def schedule(self, command, delay, interval=None):
+        """
+        Schedule a command to be executed after a delay, and optionally repeated on an interval.
+
+        @param command: The command to execute.
+        @type command: Command
+        @param delay: The number of seconds to wait before executing the command.
+        @type delay: float
+        @param interval: The number of seconds between repeats, or None to execute the command once.
+        @type interval: float
+        @return: A handle to cancel the command with.
+        @rtype: ScheduledCommand
+        @raise AttributeError: If the command is not valid for the invoker.
+        """
+        self.invoker._validate(command.__class__)
+        due = ceil((monotonic() + delay - self._started) / self.tick)
+        interval = None if interval is None else max(ceil(interval / self.tick), 1)
+        with self._lock:
+            scheduled = ScheduledCommand(command, max(due, self._current + 1), interval)
+            self._insert(scheduled)
+        return scheduled
+
+    def cancel(self, scheduled):
+        """
+        Cancel a scheduled command, including any repeats.
+
+        @param scheduled: The handle returned when the command was scheduled.
+        @type scheduled: ScheduledCommand
+        @return: True if the command was cancelled, False if it had already fired or been cancelled.
+        """
+        with self._lock:
+            scheduled.interval = None
+            if scheduled.slot is None:
+                return False
+            del scheduled.slot[scheduled]
+            scheduled.slot = None
+            return True
+
+    def _run(self):
+        """
+        The schedulers thread, advancing the wheel one tick at a time and executing due commands.
+        """
+        while not self._stopped.is_set():
+            wait = self._started + (self._current + 1) * self.tick - monotonic()
+            if wait > 0:
+                self._stopped.wait(wait)
+                continue
+
+            for scheduled, due in self._advance():
+                lag = monotonic() - (self._started + due * self.tick)
+                self.fired += 1
+                self.lag_total += lag
+                if lag > self.lag_max:
+                    self.lag_max = lag
+                try:
+                    result = self.invoker.execute(scheduled.command)
+                except Exception as error:
+                    self._report(scheduled.command, error)
+                else:
+                    if isinstance(result, Future):
+                        result.add_done_callback(partial(self._done, scheduled.command))
+
+    def _done(self, command, future):
+        """
+        Report the error of a command which failed on the workers of a ThreadedInvoker.
+
+        @param command: The command which was executed.
+        @type command: Command
+        @param future: The finished future of the command.
+        @type future: Future
+        """
+        if not future.cancelled() and future.exception() is not None:
+            self._report(command, future.exception())
+
+    def _report(self, command, error):
+        """
+        Pass the error of a failed command to on_error, or print its traceback.
+
+        @param command: The command which failed.
+        @type command: Command
+        @param error: The error the command raised.
+        @type error: Exception
+        """
+        if self.on_error is None:
+            print_exception(type(error), error, error.__traceback__)
+        else:
+            self.on_error(command, error)
+
+    def _advance(self):
+        """
+        Advance the wheel by one tick, cascading higher levels down and rescheduling repeating commands.
+
+        @return: A list of (handle, due tick) tuples for the commands due on the new tick.
+        """
+        with self._lock:
+            self._current += 1
+            index = self._current & self._mask
+            if index == 0:
+                self._cascade(1)
+
+            slot = self._wheels[0][index]
+            due = [(scheduled, scheduled.due) for scheduled in slot]
+            slot.clear()
+            for scheduled, tick in due:
+                scheduled.slot = None
+                if scheduled.interval is not None:
+                    scheduled.due = max(scheduled.due + scheduled.interval, self._current + 1)
+                    self._insert(scheduled)
+            return due
+
+    def _cascade(self, level):
+        """
+        Move the commands in the current slot of a level down to the levels below. Must hold the schedulers lock.
+
+        @param level: The level to cascade.
+        @type level: int
+        """
+        if level >= self.levels:
+            slot = self._overflow
+        else:
+            index = (self._current >> (self._bits * level)) & self._mask
+            if index == 0:
+                self._cascade(level + 1)
+            slot = self._wheels[level][index]
+
+        scheduled_commands = list(slot)
+        slot.clear()
+        for scheduled in scheduled_commands:
+            self._insert(scheduled)
+
+    def _insert(self, scheduled):
+        """
+        Put a command in the slot for its due tick. Must hold the schedulers lock.
+
+        @param scheduled: The command to insert.
+        @type scheduled: ScheduledCommand
+        """
+        delta = scheduled.due - self._current
+        slot = self._overflow
+        for level in range(self.levels):
+            if delta < 1 << (self._bits * (level + 1)):
+                index = (max(scheduled.due, self._current) >> (self._bits * level)) & self._mask
+                slot = self._wheels[level][index]
+                break
+        slot[scheduled] = None
+        scheduled.slot = slot
+
+
+class CommandJournal(object):
+    """
+    Append-only on-disk journal of executed commands, used to rebuild a receivers state after a crash.
+
+    Each command is written as a frame of its length, a CRC32 checksum and its pickled class, attributes and whether
+    it was undone. Undone commands are unexecuted on replay, and the commands of a MacroCommand are written as frames
+    of their own. The receiver is not written; replayed commands are bound to the receiver being rebuilt, so a journal
+    only accepts commands for the receiver of the first command appended to it. Frames are fsynced in batches, so after
+    a crash at most the last sync_every commands are lost, and a torn final frame is discarded on replay.
+
+    A snapshot of the receiver is taken every snapshot_every commands. Replay starts from the latest snapshot and
+    streams the rest of the journal through a memory map, so replay time stays bounded however large the journal is.
+    """
+    def __init__(self, path, sync_every=64, snapshot_every=None):
+        """
+        Initialize a new CommandJournal instance.
+
+        @param path: The path of the journal file. Snapshots are kept next to it with a .snapshot suffix.
+        @type path: str
+        @param sync_every: The number of commands to write between fsyncs.
+        @type sync_every: int
+        @param snapshot_every: The number of commands to write between snapshots, or None to only snapshot manually.
+        @type snapshot_every: int
+        """
+        self.path = path
+        self.snapshot_path = path + '.snapshot'
+        self.sync_every = sync_every
+        self.snapshot_every = snapshot_every
+        self.receiver = None
+        self._file = None
+        self._unsynced = 0
+        self._since_snapshot = 0
+
+    def check(self, command):
+        """
+        Check that a command is for the receiver this journal is for, before it is executed.
+
+        @param command: The command to check.
+        @type command: Command
+        @return: The receiver of the command.
+        @raise ValueError: If the command is for a different receiver than the commands already journaled.
+        """
+        receiver = self.receiver
+        for each in self._commands(command):
+            if receiver is None:
+                receiver = each._receiver
+            elif each._receiver is not receiver:
+                raise ValueError('A CommandJournal can only journal commands for a single receiver')
+        return receiver
+
+    def append(self, command, undo=False):
+        """
+        Append a command to the journal.
+
+        @param command: The executed or unexecuted command.
+        @type command: Command
+        @param undo: Whether the command was unexecuted.
+        @type undo: bool
+        @raise ValueError: If the command is for a different receiver than the commands already journaled.
+        """
+        self.receiver = self.check(command)
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        for each in self._commands(command, undo):
+            state = {name: value for name, value in vars(each).items() if name != '_receiver'}
+            payload = dumps((each.__class__, state, undo), HIGHEST_PROTOCOL)
+            self._file.write(_FRAME_HEADER.pack(len(payload), crc32(payload)))
+            self._file.write(payload)
+            self._unsynced += 1
+            self._since_snapshot += 1
+
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        if self.snapshot_every is not None and self._since_snapshot >= self.snapshot_every:
+            self.snapshot(self.receiver)
+
+    def sync(self):
+        """
+        Flush every appended command to disk.
+        """
+        if self._file is not None:
+            self._file.flush()
+            fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def snapshot(self, receiver):
+        """
+        Save a snapshot of a receiver, so replay can skip every command journaled so far.
+
+        @param receiver: The receiver whose state is the result of every command journaled so far.
+        @type receiver: Receiver
+        @raise ValueError: If the receiver is not the one the journaled commands are for.
+        """
+        if self.receiver is not None and receiver is not self.receiver:
+            raise ValueError('A CommandJournal can only snapshot the receiver of its commands')
+        self.sync()
+        offset = getsize(self.path) if exists(self.path) else 0
+        temporary_path = self.snapshot_path + '.tmp'
+        with open(temporary_path, 'wb') as snapshot_file:
+            snapshot_file.write(_SNAPSHOT_HEADER.pack(offset))
+            snapshot_file.write(dumps(receiver, HIGHEST_PROTOCOL))
+            snapshot_file.flush()
+            fsync(snapshot_file.fileno())
+        replace(temporary_path, self.snapshot_path)
+        self._since_snapshot = 0
+
+    def replay(self, receiver):
+        """
+        Rebuild a receivers state by executing, or unexecuting if they were undone, every journaled command after the
+        latest snapshot.
+
+        @param receiver: The receiver to replay commands on if there is no snapshot.
+        @type receiver: Receiver
+        @return: The rebuilt receiver, restored from the latest snapshot if there is one.
+        """
+        offset = 0
+        if exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as snapshot_file:
+                data = snapshot_file.read()
+            offset, = _SNAPSHOT_HEADER.unpack_from(data)
+            receiver = loads(data[_SNAPSHOT_HEADER.size:])
+
+        for command, undone in self._read(offset):
+            command._receiver = receiver
+            if undone:
+                command.unexecute()
+            else:
+                command.execute()
+        return receiver
+
+    def close(self):
+        """
+        Sync and close the journal file.
+        """
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @classmethod
+    def _commands(cls, command, undo=False):
+        """
+        Flatten a command into the commands to write, expanding MacroCommands into their commands.
+
+        @param command: The command to flatten.
+        @type command: Command
+        @param undo: Whether the command was unexecuted, listing the commands of a MacroCommand in reverse.
+        @type undo: bool
+        @return: A generator of commands.
+        """
+        if isinstance(command, MacroCommand):
+            for each in (reversed(command.commands) if undo else command.commands):
+                yield from cls._commands(each, undo)
+        else:
+            yield command
+
+    def _read(self, offset):
+        """
+        Stream commands out of the journal through a memory map, discarding a torn or corrupt tail.
+
+        @param offset: The offset to start reading from.
+        @type offset: int
+        @return: A generator of (command, undone) tuples, the commands without receivers.
+        """
+        if self._file is not None:
+            self._file.flush()
+        if not exists(self.path) or getsize(self.path) <= offset:
+            return
+
+        with open(self.path, 'rb') as journal_file, mmap(journal_file.fileno(), 0, access=ACCESS_READ) as journal:
+            end = len(journal)
+            while offset + _FRAME_HEADER.size <= end:
+                length, checksum = _FRAME_HEADER.unpack_from(journal, offset)
+                start = offset + _FRAME_HEADER.size
+                payload = journal[start:start + length]
+                if len(payload) < length or crc32(payload) != checksum:
+                    break
+                command_class, state, undone = loads(payload)
+                command = command_class.__new__(command_class)
+                command.__dict__.update(state)
+                offset = start + length
+                yield command, undone
+
+        if offset < end:
+            truncate(self.path, offset)
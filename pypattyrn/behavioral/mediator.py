@@ -1,18 +1,51 @@
-from collections import defaultdict
+from asyncio import gather, get_running_loop, wait_for, TimeoutError as AsyncTimeoutError
+from functools import partial
+from inspect import isawaitable
+from threading import Lock
+
+
+class _TopicNode(object):
+    """
+    Node of the topic trie of a Mediator, one per word of the connected topic patterns.
+    """
+    __slots__ = ('children', 'handlers', 'order')
+
+    def __init__(self):
+        self.children = {}
+        self.handlers = ()
+        self.order = 0
 
 
 class Mediator(object):
     """
     Mediator class as part of the Mediator design pattern.
 
+    The handlers of each signal are kept in a tuple which is replaced rather than modified when receivers connect or
+    disconnect, so a signal being sent is unaffected by handlers connecting or disconnecting, and sending a signal
+    nothing is connected to stores nothing.
+
+    Receivers can connect to topic patterns of dot separated words, where * matches exactly one word and # matches
+    any number of words, for example orders.*.created or orders.#. Patterns are kept in a trie of words rather than
+    in signals, and the handlers a signal resolves to, those connected to its exact name followed by those of the
+    matching patterns in the order the patterns were first connected, are cached until receivers connect or disconnect.
+
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#mediator-pattern}
     - External Mediator Pattern documentation: U{https://en.wikipedia.org/wiki/Mediator_pattern}
     """
-    def __init__(self):
+    def __init__(self, cache_size=1024):
         """
         Initialize a new Mediator instance.
+
+        @param cache_size: The number of signal names to cache the resolved handlers of while patterns are connected.
+        @type cache_size: int
         """
-        self.signals = defaultdict(list)
+        self.signals = {}
+        self.cache_size = cache_size
+        self._lock = Lock()
+        self._topics = _TopicNode()
+        self._patterns = 0
+        self._wildcards = 0
+        self._resolved = {}
 
     def signal(self, signal_name, *args, **kwargs):
         """
@@ -23,28 +56,235 @@ class Mediator(object):
         @param args: Positional arguments to send with the signal.
         @param kwargs: Keyword arguments to send with the signal.
         """
-        for handler in self.signals[signal_name]:
+        for handler in self._handlers(signal_name):
             handler(*args, **kwargs)
 
     def connect(self, signal_name, receiver):
         """
-        Connect a receiver to a signal.
+        Connect a receiver to a signal or topic pattern.
 
-        @param signal_name: The name of the signal to connect the receiver to.
+        @param signal_name: The name of the signal or the topic pattern to connect the receiver to.
         @type signal_name: str
         @param receiver: A handler to call when the signal is sent out.
         """
-        self.signals[signal_name].append(receiver)
+        with self._lock:
+            self._resolved.clear()
+            if not self._is_pattern(signal_name):
+                self.signals[signal_name] = self.signals.get(signal_name, ()) + (receiver,)
+                return
+
+            node = self._topics
+            for word in signal_name.split('.'):
+                node = node.children.setdefault(word, _TopicNode())
+            if not node.order:
+                self._patterns += 1
+                node.order = self._patterns
+            node.handlers += (receiver,)
+            self._wildcards += 1
 
     def disconnect(self, signal_name, receiver):
         """
-        Disconnect a receiver from a signal.
+        Disconnect a receiver from a signal or topic pattern.
 
-        @param signal_name: The name of the signal to disconnect the receiver from.
+        @param signal_name: The name of the signal or the topic pattern to disconnect the receiver from.
         @type signal_name: str
         @param receiver: The receiver to disconnect from the signal.
         """
+        with self._lock:
+            if not self._is_pattern(signal_name):
+                handlers = self.signals.get(signal_name, ())
+                try:
+                    index = handlers.index(receiver)
+                except ValueError:
+                    return
+                handlers = handlers[:index] + handlers[index + 1:]
+                if handlers:
+                    self.signals[signal_name] = handlers
+                else:
+                    del self.signals[signal_name]
+            else:
+                path = [(None, self._topics)]
+                for word in signal_name.split('.'):
+                    node = path[-1][1].children.get(word)
+                    if node is None:
+                        return
+                    path.append((word, node))
+                try:
+                    index = node.handlers.index(receiver)
+                except ValueError:
+                    return
+                node.handlers = node.handlers[:index] + node.handlers[index + 1:]
+                self._wildcards -= 1
+                while len(path) > 1 and not path[-1][1].handlers and not path[-1][1].children:
+                    word, node = path.pop()
+                    del path[-1][1].children[word]
+            self._resolved.clear()
+
+    def _handlers(self, signal_name):
+        """
+        Get the handlers a signal is sent out to.
+
+        @param signal_name: The name of the signal.
+        @type signal_name: str
+        @return: A tuple of handlers.
+        """
+        if not self._wildcards or not isinstance(signal_name, str):
+            return self.signals.get(signal_name, ())
+        handlers = self._resolved.get(signal_name)
+        if handlers is not None:
+            return handlers
+
+        with self._lock:
+            matched = set()
+            self._match(self._topics, signal_name.split('.'), 0, matched)
+            handlers = self.signals.get(signal_name, ())
+            for node in sorted(matched, key=lambda node: node.order):
+                handlers += node.handlers
+            if self.cache_size:
+                if len(self._resolved) >= self.cache_size:
+                    del self._resolved[next(iter(self._resolved))]
+                self._resolved[signal_name] = handlers
+        return handlers
+
+    @classmethod
+    def _match(cls, node, words, index, matched):
+        """
+        Collect the nodes of the topic trie whose pattern matches the words of a signal name.
+
+        @param node: The node matching the words before index.
+        @param words: The words of the signal name.
+        @param index: The index of the next word to match.
+        @param matched: A set to add the matching nodes with handlers to.
+        """
+        any_words = node.children.get('#')
+        if any_words is not None:
+            for rest in range(index, len(words) + 1):
+                cls._match(any_words, words, rest, matched)
+        if index == len(words):
+            if node.handlers:
+                matched.add(node)
+            return
+        for word in (words[index], '*'):
+            child = node.children.get(word)
+            if child is not None:
+                cls._match(child, words, index + 1, matched)
+
+    @staticmethod
+    def _is_pattern(signal_name):
+        """
+        @param signal_name: The name of a signal.
+        @type signal_name: str
+        @return: True if the name is a topic pattern containing a * or # word.
+        """
+        return isinstance(signal_name, str) and any(word in ('*', '#') for word in signal_name.split('.'))
+
+
+class _Blocking(object):
+    """
+    Receiver connected to an AsyncMediator as blocking, comparing equal to the receiver it wraps so it can be
+    disconnected with it.
+    """
+    __slots__ = ('receiver',)
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def __eq__(self, other):
+        if isinstance(other, _Blocking):
+            other = other.receiver
+        return self.receiver == other
+
+    def __hash__(self):
+        return hash(self.receiver)
+
+
+class AsyncMediator(Mediator):
+    """
+    asyncio Mediator class as part of the Mediator design pattern.
+
+    Sending a signal calls every connected handler and awaits the ones returning awaitables concurrently, so it takes
+    as long as the slowest handler. Handlers connected as blocking are run in an executor instead.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#mediator-pattern}
+    - External Mediator Pattern documentation: U{https://en.wikipedia.org/wiki/Mediator_pattern}
+    """
+    def __init__(self, executor=None, timeout=None, cache_size=1024):
+        """
+        Initialize a new AsyncMediator instance.
+
+        @param executor: The executor to run blocking handlers in, or None for the default executor of the loop.
+        @type executor: Executor
+        @param timeout: The default number of seconds a signal may take, or None to wait forever.
+        @type timeout: float
+        @param cache_size: The number of signal names to cache the resolved handlers of while patterns are connected.
+        @type cache_size: int
+        """
+        super().__init__(cache_size)
+        self.executor = executor
+        self.timeout = timeout
+        self.timeouts = {}
+
+    def set_timeout(self, signal_name, timeout):
+        """
+        Set the number of seconds a signal may take, overriding the default timeout.
+
+        @param signal_name: The name of the signal.
+        @type signal_name: str
+        @param timeout: The number of seconds, or None to wait forever.
+        @type timeout: float
+        """
+        self.timeouts[signal_name] = timeout
+
+    async def signal(self, signal_name, *args, **kwargs):
+        """
+        Send a signal out to all connected handlers and wait for them to finish.
+
+        @param signal_name: The name of the signal.
+        @type signal_name: Str
+        @param args: Positional arguments to send with the signal.
+        @param kwargs: Keyword arguments to send with the signal.
+        @return: A list of the results of the handlers in the order they were connected.
+        @raise TimeoutError: If the handlers did not finish before the timeout of the signal expired.
+        """
+        handlers = self._handlers(signal_name)
+        if not handlers:
+            return []
+
+        loop = get_running_loop()
+        calls = gather(*(self._call(loop, handler, args, kwargs) for handler in handlers))
+        timeout = self.timeouts.get(signal_name, self.timeout)
+        if timeout is None:
+            return await calls
         try:
-            self.signals[signal_name].remove(receiver)
-        except ValueError:
-            pass
+            return await wait_for(calls, timeout)
+        except AsyncTimeoutError:
+            raise TimeoutError('Handlers of signal {0} did not finish in time'.format(signal_name))
+
+    async def _call(self, loop, handler, args, kwargs):
+        """
+        Call a handler, in the executor if it is blocking, awaiting its result if it is awaitable.
+
+        @param loop: The running event loop.
+        @param handler: The handler to call.
+        @param args: Positional arguments for the handler.
+        @param kwargs: Keyword arguments for the handler.
+        @return: The result of the handler.
+        """
+        if isinstance(handler, _Blocking):
+            return await loop.run_in_executor(self.executor, partial(handler.receiver, *args, **kwargs))
+        result = handler(*args, **kwargs)
+        if isawaitable(result):
+            result = await result
+        return result
+
+    def connect(self, signal_name, receiver, blocking=False):
+        """
+        Connect a receiver to a signal or topic pattern.
+
+        @param signal_name: The name of the signal or the topic pattern to connect the receiver to.
+        @type signal_name: str
+        @param receiver: A handler or coroutine function to call when the signal is sent out.
+        @param blocking: Whether the receiver is a blocking function to run in the executor.
+        @type blocking: bool
+        """
+        super().connect(signal_name, _Blocking(receiver) if blocking else receiver)
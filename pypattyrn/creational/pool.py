@@ -1,75 +1,1088 @@
-from abc import ABCMeta
+from abc import ABCMeta, abstractmethod
+from asyncio import get_running_loop, wait_for, TimeoutError as AsyncTimeoutError
+from bisect import bisect_left
+from collections import deque
+from contextlib import asynccontextmanager
 from copy import deepcopy
-from pypattyrn.behavioral.memento import Originator
+from math import ceil
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from os import getpid, kill, name as os_name
+from sys import version_info
+from threading import Condition, Event, Thread, local
+from time import monotonic
+from traceback import StackSummary, extract_stack, format_list
+from warnings import warn
+from weakref import WeakSet, ref as weakref
+from pypattyrn.behavioral.memento import Originator, Memento
+
+_IMMUTABLE_TYPES = frozenset((type(None), bool, int, float, complex, str, bytes, range))
+
+
+def _pid_alive(pid):
+    """
+    Check whether a process is still running.
+
+    Only POSIX systems can be checked, on other systems every process is assumed to be alive.
+
+    @param pid: The id of the process to check.
+    @type pid: int
+    @return: False if the process is known to have exited, True otherwise.
+    """
+    if os_name != 'posix':
+        return True
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
 
 
 class Reusable(Originator, metaclass=ABCMeta):
     """
     An abstract reusable class.
 
+    Resetting restores the state the object was created with. Subclasses can make this cheaper by either:
+        - Defining a reset_state method, which is called instead of restoring the saved state.
+        - Listing fields in immutable_fields, which are restored by reference rather than deep copied.
+
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPattyrn#object-pool-pattern}
     - External Object Pool Pattern documentation: U{https://en.wikipedia.org/wiki/Object_pool_pattern}
     """
+    immutable_fields = ()
+    _reset_hook = False
+    _shallow_fields = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Build the reset plan for a Reusable subclass once, when the class is defined.
+        """
+        super().__init_subclass__(**kwargs)
+        cls._reset_hook = callable(getattr(cls, 'reset_state', None))
+        cls._shallow_fields = frozenset(cls.immutable_fields)
+
     def __init__(self):
         """
         Initialize a new Reusable instance.
         """
-        self.memento = self.commit()
+        self.memento = None if self._reset_hook else self.commit()
 
     def reset(self):
         """
         Reset this objects state to the state that it was created with.
         """
+        if self._reset_hook:
+            self.reset_state()
+            return
+
         memento = self.memento
-        self.rollback(deepcopy(memento))
+        shallow_fields = self._shallow_fields
+        memo = {}
+        state = {}
+        for name, value in memento.state.items():
+            if name in shallow_fields or type(value) in _IMMUTABLE_TYPES:
+                state[name] = value
+            else:
+                state[name] = deepcopy(value, memo)
+        self.rollback(Memento(state))
         self.memento = memento
 
+    def validate(self):
+        """
+        Check that this object is still healthy enough to be handed out by a pool.
+
+        Override this for objects that can go stale, the default implementation always succeeds.
+
+        @return: True if the object can be used, False if it should be discarded.
+        """
+        return True
+
+
+class GrowthPolicy(object, metaclass=ABCMeta):
+    """
+    Abstract policy deciding how many objects a Pool creates when it runs out of free objects.
+    """
+    @abstractmethod
+    def grow_by(self, size, in_use):
+        """
+        Decide how many objects to create.
+
+        @param size: The number of objects the pool currently holds, free or in use.
+        @type size: int
+        @param in_use: The number of objects currently acquired from the pool.
+        @type in_use: int
+        @return: The number of objects to create.
+        """
+        pass
+
+
+class FixedGrowth(GrowthPolicy):
+    """
+    Grow a Pool by the same number of objects every time.
+    """
+    def __init__(self, step=2):
+        """
+        Initialize a new FixedGrowth instance.
+
+        @param step: The number of objects to create each time the pool grows.
+        @type step: int
+        """
+        self.step = step
+
+    def grow_by(self, size, in_use):
+        return self.step
+
+
+class ExponentialGrowth(GrowthPolicy):
+    """
+    Grow a Pool by a factor of its current size every time.
+    """
+    def __init__(self, factor=2):
+        """
+        Initialize a new ExponentialGrowth instance.
+
+        @param factor: The factor to multiply the pools size by each time it grows.
+        @type factor: float
+        """
+        self.factor = factor
+
+    def grow_by(self, size, in_use):
+        return max(int(size * self.factor) - size, 1)
+
+
+class TargetUtilizationGrowth(GrowthPolicy):
+    """
+    Grow a Pool just enough that the fraction of its objects in use stays at or below a target.
+    """
+    def __init__(self, target=0.75):
+        """
+        Initialize a new TargetUtilizationGrowth instance.
+
+        @param target: The fraction of objects that should be in use after growing, between 0 and 1.
+        @type target: float
+        """
+        self.target = target
+
+    def grow_by(self, size, in_use):
+        return max(ceil((in_use + 1) / self.target) - size, 1)
+
+
+class PoolMetrics(object):
+    """
+    Sink for Pool metrics.
+
+    This base implementation ignores everything, subclasses override the methods to collect or export metrics.
+    The methods are called while the pool holds its lock so they should be quick.
+    """
+    def record_acquire(self, wait_time, hit, in_use):
+        """
+        Record an object being acquired from a pool.
+
+        @param wait_time: Seconds spent inside acquire.
+        @type wait_time: float
+        @param hit: True if the object was served from the free list, False if the pool had to grow or wait.
+        @type hit: bool
+        @param in_use: The number of objects in use after the acquire.
+        @type in_use: int
+        """
+        pass
+
+    def record_release(self, checkout_time):
+        """
+        Record an object being released back into a pool.
+
+        @param checkout_time: Seconds the object was checked out for.
+        @type checkout_time: float
+        """
+        pass
+
+    def record_validation_failure(self):
+        """
+        Record an object failing validation on acquire and being discarded.
+        """
+        pass
+
+
+class PoolStats(PoolMetrics):
+    """
+    PoolMetrics sink aggregating metrics in memory.
+    """
+    def __init__(self, buckets=(0.0001, 0.001, 0.01, 0.1, 1.0)):
+        """
+        Initialize a new PoolStats instance.
+
+        @param buckets: Sorted upper bounds in seconds of the acquire wait time histogram buckets. A final bucket
+                        counts everything above the last bound.
+        """
+        self.buckets = tuple(buckets)
+        self.wait_histogram = [0] * (len(self.buckets) + 1)
+        self.hits = 0
+        self.misses = 0
+        self.high_water = 0
+        self.checkouts = 0
+        self.checkout_total = 0.0
+        self.checkout_max = 0.0
+        self.validation_failures = 0
+
+    @property
+    def hit_rate(self):
+        """
+        @return: The fraction of acquires served from the free list.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def record_acquire(self, wait_time, hit, in_use):
+        self.wait_histogram[bisect_left(self.buckets, wait_time)] += 1
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if in_use > self.high_water:
+            self.high_water = in_use
+
+    def record_release(self, checkout_time):
+        self.checkouts += 1
+        self.checkout_total += checkout_time
+        if checkout_time > self.checkout_max:
+            self.checkout_max = checkout_time
+
+    def record_validation_failure(self):
+        self.validation_failures += 1
+
 
 class Pool(object):
     """
     An Object Pool design pattern implementation.
 
+    The pool is thread safe. When a max_size is given the pool is bounded and acquire will block until an object
+    is released rather than creating more objects than max_size.
+
+    When an idle_ttl or low_water mark is given a background thread evicts objects left idle longer than idle_ttl
+    and pre-warms the pool so at least low_water free objects are ready. Call close to stop that thread.
+
+    Metrics are sent to an optional PoolMetrics sink. In debug mode the stack of every acquire is recorded, and a
+    ResourceWarning is issued for objects that are garbage collected without being released.
+
+    When a thread_cache size is given each thread keeps that many released objects in a cache of its own, which it
+    acquires from without taking the pools lock. The shared free list is only used to refill an empty thread cache
+    or to take the overflow of a full one. A thread which would otherwise have to wait for a release takes the
+    objects sitting in other threads caches instead, idle objects are evicted from thread caches as well, and cached
+    objects are returned to the shared free list when their thread exits.
+
+    When validate_after is given, objects that have been idle at least that many seconds are checked with their
+    validate method before being handed out. Objects failing validation, or whose validate raises, are discarded and
+    replaced in the background.
+
     - External Usage documentation: U{https://github.com/tylerlaberge/PyPatterns/wiki/Creational-Pattern-Usage}
     - External Object Pool Pattern documentation: U{https://en.wikipedia.org/wiki/Object_pool_pattern}
     """
-    def __init__(self, reusable_class, *args, **kwargs):
+    def __init__(self, reusable_class, *args, min_size=None, max_size=None, growth=None, idle_ttl=None,
+                 low_water=None, metrics=None, debug=False, thread_cache=0, validate_after=None, reusable_kwargs=None,
+                 **kwargs):
         """
         Initialize a new object pool instance.
 
+        The pool options below are taken out of the keyword arguments, so they are no longer passed on to the
+        reusable class. A reusable whose own keyword arguments share a name with a pool option, such as debug or
+        metrics, must be given them through reusable_kwargs instead.
+
         @param reusable_class: The reusable class this object pool is responsible for.
         @param args: args for reusable object creation.
+        @param min_size: The number of objects to create up front and never evict below. Defaults to the pool size.
+        @type min_size: int
+        @param max_size: The maximum number of objects this pool may create, or None for an unbounded pool.
+        @type max_size: int
+        @param growth: The policy deciding how many objects to create when the pool runs out. Defaults to a
+                       FixedGrowth of the pool size.
+        @type growth: GrowthPolicy
+        @param idle_ttl: Seconds a free object may sit idle before it is evicted, or None to never evict.
+        @type idle_ttl: float
+        @param low_water: The number of free objects to keep pre-warmed in the background, or None to disable.
+        @type low_water: int
+        @param metrics: A sink to send metrics to, or None to disable metrics.
+        @type metrics: PoolMetrics
+        @param debug: Whether to record the stack of every acquire and warn about objects never released.
+        @type debug: bool
+        @param thread_cache: The number of released objects each thread may keep for itself, or 0 to disable.
+        @type thread_cache: int
+        @param validate_after: Seconds an object must be idle before it is validated on acquire, or None to never
+                               validate.
+        @type validate_after: float
+        @param reusable_kwargs: kwargs for reusable object creation whose names clash with pool options.
+        @type reusable_kwargs: dict
         @param kwargs: kwargs for reusable object creation.
+        @raise ValueError: If min_size is greater than max_size.
         """
         self.reusables = list()
         self.reusable_class = reusable_class
         self.args = args
-        self.kwargs = kwargs
+        self.kwargs = kwargs if reusable_kwargs is None else dict(kwargs, **reusable_kwargs)
         self.pool_size = 2
-        self._expand(self.pool_size)
+        self.max_size = max_size
+        if min_size is None:
+            min_size = self.pool_size if max_size is None else min(self.pool_size, max_size)
+        if max_size is not None and min_size > max_size:
+            raise ValueError('min_size can not be greater than max_size')
+        self.min_size = min_size
+        self.growth = FixedGrowth(self.pool_size) if growth is None else growth
+        self.idle_ttl = idle_ttl
+        self.low_water = low_water
+        self.metrics = metrics
+        self.debug = debug
+        self._tracking = metrics is not None or debug
+        self._checkouts = dict()
+        self.thread_cache = thread_cache
+        self._local = local()
+        self._caches = WeakSet()
+        self._waiting = 0
+        self.validate_after = validate_after
+        self._replacements = 0
+        self._size = 0
+        self._idle_since = dict()
+        self._available = Condition()
+        self._refill = Event()
+        self._closed = False
+        with self._available:
+            self._expand(self.min_size)
+
+        self._maintainer = None
+        if idle_ttl is not None or low_water is not None or validate_after is not None:
+            self._maintainer = Thread(target=self._maintain, daemon=True)
+            self._maintainer.start()
+            self._refill.set()
 
-    def acquire(self):
+    def acquire(self, timeout=None):
         """
         Acquire an object from the pool.
 
+        If the pool is bounded and every object is in use this blocks until an object is released.
+
+        @param timeout: The maximum number of seconds to wait for an object, or None to wait forever.
+        @type timeout: float
         @return: An object from the pool.
+        @raise TimeoutError: If no object became available before the timeout expired.
         """
-        try:
-            reusable = self.reusables.pop()
-        except IndexError:
-            self._expand(self.pool_size)
-            reusable = self.reusables.pop()
+        started = monotonic()
+        while True:
+            remaining = None if timeout is None else max(timeout - (monotonic() - started), 0)
+            reusable, idle_since = self._acquire_one(started, remaining)
+            if self._usable(reusable, idle_since):
+                return reusable
 
-        return reusable
+    def try_acquire(self):
+        """
+        Acquire an object from the pool without blocking.
+
+        @return: An object from the pool, or None if the pool is bounded and every object is in use.
+        """
+        started = monotonic()
+        while True:
+            reusable, idle_since = self._acquire_one(started, 0, block=False)
+            if reusable is None or self._usable(reusable, idle_since):
+                return reusable
 
     def release(self, reusable):
         """
         Release an object back into the pool.
 
         @param reusable: The object to return to the pool.
+        @raise ValueError: If the object is already free in the pool or in the calling threads cache.
         """
+        if id(reusable) in self._idle_since or (self.thread_cache and self._cached(reusable)):
+            raise ValueError('{0} was released twice'.format(self.reusable_class.__name__))
         reusable.reset()
+        if self.thread_cache and not self._waiting:
+            cache = self._thread_reusables()
+            if len(cache) < self.thread_cache:
+                if self._tracking:
+                    with self._available:
+                        self._check_in(reusable)
+                cache.append((reusable, monotonic()))
+                if self._waiting:
+                    with self._available:
+                        if self._steal():
+                            self._available.notify_all()
+                return
+
+        with self._available:
+            if id(reusable) in self._idle_since:
+                raise ValueError('{0} was released twice'.format(self.reusable_class.__name__))
+            if self._tracking:
+                self._check_in(reusable)
+            self._put(reusable)
+            self._available.notify()
+
+    def leaks(self):
+        """
+        Report the objects currently checked out of the pool along with where they were acquired.
+
+        Only available in debug mode.
+
+        @return: A list of (object, stack) tuples, the stack being a traceback.StackSummary of the acquire.
+        """
+        with self._available:
+            checkouts = [(reference(), stack) for acquired_at, stack, reference in self._checkouts.values()
+                         if reference is not None]
+        return [(reusable, stack) for reusable, stack in checkouts if reusable is not None]
+
+    def evict_idle(self):
+        """
+        Evict free objects that have been idle longer than idle_ttl, keeping at least min_size objects and
+        low_water free objects in the pool.
+
+        @return: The number of objects evicted.
+        """
+        if self.idle_ttl is None:
+            return 0
+
+        deadline = monotonic() - self.idle_ttl
+        with self._available:
+            evictable = min(self._size - self.min_size, len(self.reusables) - (self.low_water or 0))
+            count = 0
+            while count < evictable and self._idle_since[id(self.reusables[count])] <= deadline:
+                del self._idle_since[id(self.reusables[count])]
+                count += 1
+            del self.reusables[:count]
+            self._size -= count
+
+            for cache in list(self._caches):
+                while self._size > self.min_size and cache and cache[0][1] <= deadline:
+                    try:
+                        cache.pop(0)
+                    except IndexError:
+                        break
+                    self._size -= 1
+                    count += 1
+
+        return count
+
+    def close(self):
+        """
+        Stop the background thread evicting and pre-warming objects, if there is one.
+        """
+        self._closed = True
+        self._refill.set()
+        if self._maintainer is not None:
+            self._maintainer.join()
+
+    def _acquire_one(self, started, timeout, block=True):
+        """
+        Take an object from the calling threads cache or from the shared free list, growing the pool or waiting
+        for a release if needed.
+
+        @param started: When the acquire started.
+        @type started: float
+        @param timeout: The maximum number of seconds to wait for an object, or None to wait forever.
+        @type timeout: float
+        @param block: Whether to wait for a release if the pool is bounded and every object is in use.
+        @type block: bool
+        @return: An (object, idle since) tuple, or (None, None) if not blocking and no object is available.
+        @raise TimeoutError: If no object became available before the timeout expired.
+        """
+        if self.thread_cache:
+            try:
+                reusable, idle_since = self._thread_reusables().pop()
+            except IndexError:
+                pass
+            else:
+                if self._tracking:
+                    with self._available:
+                        self._check_out(reusable, started, True)
+                return reusable, idle_since
+
+        with self._available:
+            hit = bool(self.reusables)
+            if not hit:
+                self._grow()
+            if not self.reusables:
+                self._waiting += 1
+                try:
+                    if self.thread_cache:
+                        self._steal()
+                    if not block and not self.reusables:
+                        return None, None
+                    if not self._available.wait_for(lambda: self.reusables, timeout):
+                        raise TimeoutError('No object became available in the pool')
+                finally:
+                    self._waiting -= 1
+
+            reusable, idle_since = self._take()
+            if self._tracking:
+                self._check_out(reusable, started, hit)
+            return reusable, idle_since
+
+    def _usable(self, reusable, idle_since):
+        """
+        Validate an acquired object if it has been idle long enough, discarding it if it fails.
+
+        Called without holding the pools lock, so slow validation does not block other threads. A validate method
+        raising an exception counts as a failure.
+
+        @param reusable: The acquired object.
+        @param idle_since: When the object was last released or created.
+        @type idle_since: float
+        @return: True if the object can be handed out, False if it was discarded.
+        """
+        if self.validate_after is None or monotonic() - idle_since < self.validate_after:
+            return True
+        try:
+            if reusable.validate():
+                return True
+        except Exception:
+            pass
+
+        with self._available:
+            self._checkouts.pop(id(reusable), None)
+            self._size -= 1
+            self._replacements += 1
+            if self.metrics is not None:
+                self.metrics.record_validation_failure()
+        self._refill.set()
+        return False
+
+    def _take(self):
+        """
+        Take a free object out of the pool. Must be called while holding the pools lock.
+
+        @return: An (object, idle since) tuple.
+        """
+        reusable = self.reusables.pop()
+        idle_since = self._idle_since.pop(id(reusable))
+        if self.low_water is not None and len(self.reusables) < self.low_water:
+            self._refill.set()
+        return reusable, idle_since
+
+    def _thread_reusables(self):
+        """
+        Get the calling threads cache of free objects.
+
+        @return: The calling threads cache.
+        """
+        try:
+            return self._local.reusables
+        except AttributeError:
+            cache = self._local.reusables = _ThreadCache(self)
+            with self._available:
+                self._caches.add(cache)
+            return cache
+
+    def _cached(self, reusable):
+        """
+        Check whether an object is free in the calling threads cache.
+
+        @param reusable: The object to look for.
+        @return: True if the object is in the calling threads cache.
+        """
+        return any(cached is reusable for cached, idle_since in self._thread_reusables())
+
+    def _steal(self):
+        """
+        Move the objects sitting in every threads cache onto the shared free list. Must be called while holding the
+        pools lock.
+
+        @return: The number of objects moved.
+        """
+        count = 0
+        for cache in list(self._caches):
+            while cache:
+                try:
+                    reusable, idle_since = cache.pop(0)
+                except IndexError:
+                    break
+                self._put(reusable, idle_since)
+                count += 1
+        return count
+
+    def _return_cached(self, cache):
+        """
+        Move the objects of a dead threads cache back onto the shared free list.
+
+        @param cache: The cache of the thread that exited.
+        """
+        with self._available:
+            for reusable, idle_since in cache:
+                self._put(reusable, idle_since)
+            self._available.notify(len(cache))
+
+    def _check_out(self, reusable, started, hit):
+        """
+        Record metrics and debug information for an acquired object. Must be called while holding the pools lock.
+
+        @param reusable: The acquired object.
+        @param started: When the acquire started.
+        @type started: float
+        @param hit: Whether the object was served from the free list.
+        @type hit: bool
+        """
+        now = monotonic()
+        stack = None
+        reference = None
+        if self.debug:
+            key = id(reusable)
+            stack = StackSummary.from_list([frame for frame in extract_stack() if frame.filename != __file__])
+            reference = weakref(reusable, lambda r: self._leaked(key, r))
+        self._checkouts[id(reusable)] = (now, stack, reference)
+        if self.metrics is not None:
+            self.metrics.record_acquire(now - started, hit, self._size - len(self.reusables))
+
+    def _check_in(self, reusable):
+        """
+        Record metrics for a released object. Must be called while holding the pools lock.
+
+        @param reusable: The released object.
+        """
+        checkout = self._checkouts.pop(id(reusable), None)
+        if checkout is not None and self.metrics is not None:
+            self.metrics.record_release(monotonic() - checkout[0])
+
+    def _leaked(self, key, reference):
+        """
+        Warn about an object that was garbage collected while checked out of the pool.
+
+        @param key: The id the object was checked out under.
+        @param reference: The dead weak reference to the object.
+        """
+        with self._available:
+            checkout = self._checkouts.get(key)
+            if checkout is None or checkout[2] is not reference:
+                return
+            del self._checkouts[key]
+        warn('{0} was never released back into its pool, it was acquired at:\n{1}'.format(
+            self.reusable_class.__name__, ''.join(format_list(checkout[1]))), ResourceWarning)
+
+    def _put(self, reusable, idle_since=None):
+        """
+        Put a free object into the pool. Must be called while holding the pools lock.
+
+        Objects are appended in the order they became idle, so the longest idle objects are at the front.
+
+        @param reusable: The object to put into the pool.
+        @param idle_since: When the object became idle, or None if it just did.
+        @type idle_since: float
+        """
+        self._idle_since[id(reusable)] = monotonic() if idle_since is None else idle_since
         self.reusables.append(reusable)
 
+    def _grow(self):
+        """
+        Grow the pool according to its growth policy. Must be called while holding the pools lock.
+        """
+        self._expand(self.growth.grow_by(self._size, self._size - len(self.reusables)))
+
     def _expand(self, size):
+        """
+        Create new objects for the pool, never exceeding max_size.
+
+        Must be called while holding the pools lock.
+
+        @param size: The number of objects to create.
+        @type size: int
+        """
+        if self.max_size is not None:
+            size = min(size, self.max_size - self._size)
         for i in range(0, size):
-            self.reusables.append(self.reusable_class(*self.args, **self.kwargs))
+            self._put(self.reusable_class(*self.args, **self.kwargs))
+            self._size += 1
+
+    def _maintain(self):
+        """
+        Background loop evicting idle objects, replacing objects that failed validation and pre-warming the pool up
+        to its low water mark.
+        """
+        while not self._closed:
+            self._refill.wait(self.idle_ttl)
+            self._refill.clear()
+            if self._closed:
+                break
+            self._prewarm()
+            self.evict_idle()
+
+    def _prewarm(self):
+        """
+        Create objects outside of the pools lock until discarded objects are replaced and low_water free objects are
+        ready.
+
+        Creation errors stop pre-warming quietly; they are raised on the request path if the pool has to grow.
+        """
+        while not self._closed:
+            with self._available:
+                if self.max_size is not None and self._size >= self.max_size:
+                    self._replacements = 0
+                    return
+                if self._replacements:
+                    self._replacements -= 1
+                elif self.low_water is None or len(self.reusables) >= self.low_water:
+                    return
+                self._size += 1
+            try:
+                reusable = self.reusable_class(*self.args, **self.kwargs)
+            except Exception:
+                with self._available:
+                    self._size -= 1
+                return
+            with self._available:
+                self._put(reusable)
+                self._available.notify()
+
+
+class _ThreadCache(list):
+    """
+    A single threads cache of free objects, which hands its objects back to its pool when the thread exits.
+    """
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __init__(self, pool):
+        """
+        Initialize a new thread cache.
+
+        @param pool: The pool the cached objects belong to.
+        @type pool: Pool
+        """
+        super().__init__()
+        self.pool = pool
+
+    def __del__(self):
+        if self:
+            self.pool._return_cached(self)
+
+
+class AsyncPool(object):
+    """
+    An asyncio Object Pool design pattern implementation.
+
+    Waiters for a bounded pool are served in FIFO order. Objects can be created by an async factory for reusables
+    whose construction does I/O.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPatterns/wiki/Creational-Pattern-Usage}
+    - External Object Pool Pattern documentation: U{https://en.wikipedia.org/wiki/Object_pool_pattern}
+    """
+    def __init__(self, reusable_class, *args, max_size=None, factory=None, reusable_kwargs=None, **kwargs):
+        """
+        Initialize a new async object pool instance.
+
+        As with Pool, keyword arguments sharing a name with a pool option must be given through reusable_kwargs.
+
+        @param reusable_class: The reusable class this object pool is responsible for.
+        @param args: args for reusable object creation.
+        @param max_size: The maximum number of objects this pool may create, or None for an unbounded pool.
+        @type max_size: int
+        @param factory: An optional coroutine function called with args and kwargs to create a new reusable.
+        @param reusable_kwargs: kwargs for reusable object creation whose names clash with pool options.
+        @type reusable_kwargs: dict
+        @param kwargs: kwargs for reusable object creation.
+        """
+        self.reusables = list()
+        self.reusable_class = reusable_class
+        self.args = args
+        self.kwargs = kwargs if reusable_kwargs is None else dict(kwargs, **reusable_kwargs)
+        self.max_size = max_size
+        self.factory = factory
+        self._size = 0
+        self._waiters = deque()
+
+    async def acquire(self, timeout=None):
+        """
+        Acquire an object from the pool.
+
+        If the pool is bounded and every object is in use this waits until an object is released.
+
+        @param timeout: The maximum number of seconds to wait for an object, or None to wait forever.
+        @type timeout: float
+        @return: An object from the pool.
+        @raise TimeoutError: If no object became available before the timeout expired.
+        """
+        if self.reusables:
+            return self.reusables.pop()
+        if self.max_size is None or self._size < self.max_size:
+            return await self._create()
+
+        waiter = get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            reusable = await wait_for(waiter, timeout)
+        except AsyncTimeoutError:
+            self._abandon(waiter)
+            raise TimeoutError('No object became available in the pool')
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+        if reusable is None:
+            return await self._create(reserved=True)
+        return reusable
+
+    def release(self, reusable):
+        """
+        Release an object back into the pool, handing it straight to the longest waiting acquire if there is one.
+
+        @param reusable: The object to return to the pool.
+        """
+        reusable.reset()
+        if not self._wake(reusable):
+            self.reusables.append(reusable)
+
+    @asynccontextmanager
+    async def lease(self, timeout=None):
+        """
+        Acquire an object for the duration of an async with block, releasing it when the block exits.
+
+        @param timeout: The maximum number of seconds to wait for an object, or None to wait forever.
+        @type timeout: float
+        """
+        reusable = await self.acquire(timeout)
+        try:
+            yield reusable
+        finally:
+            self.release(reusable)
+
+    async def _create(self, reserved=False):
+        """
+        Create a new object, reserving its slot in the pool before any I/O is awaited.
+
+        If creating the object fails its slot is handed to the longest waiting acquire rather than freed, so an
+        acquire arriving in the meantime can not take it.
+
+        @param reserved: Whether the slot was already reserved and handed over by a failed creation.
+        @type reserved: bool
+        @return: A new reusable object.
+        """
+        if not reserved:
+            self._size += 1
+        try:
+            if self.factory is None:
+                return self.reusable_class(*self.args, **self.kwargs)
+            return await self.factory(*self.args, **self.kwargs)
+        except BaseException:
+            if not self._wake(None):
+                self._size -= 1
+            raise
+
+    def _wake(self, reusable):
+        """
+        Resolve the longest waiting acquire with an object, or with None to hand it a reserved slot to create a new
+        object in.
+
+        @param reusable: The object to hand over, or None to hand over a reserved slot.
+        @return: True if a waiter was resolved, False otherwise.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(reusable)
+                return True
+        return False
+
+    def _abandon(self, waiter):
+        """
+        Clean up after an acquire that stopped waiting, passing on anything it was handed in the meantime.
+
+        @param waiter: The future the acquire was waiting on.
+        """
+        if waiter.done() and not waiter.cancelled():
+            reusable = waiter.result()
+            if not self._wake(reusable):
+                if reusable is None:
+                    self._size -= 1
+                else:
+                    self.reusables.append(reusable)
+        else:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+
+class SharedBufferPool(object):
+    """
+    A pool of fixed size byte slabs in shared memory, for handing buffers between processes without copying them.
+
+    Slabs are acquired and released by handle, a small int which is cheap to send to another process. Any process
+    holding the pool gets a memoryview of a slab from its handle without copying. The process owning each slab is
+    tracked in the shared segment so slabs held by processes that died without releasing them can be reclaimed.
+
+    The pool can be passed to child processes as a Process argument. The process that created the pool must call
+    close to free the shared memory, other processes should call close when they are done with it. All memoryviews
+    of slabs must be released before calling close.
+
+    - External Usage documentation: U{https://github.com/tylerlaberge/PyPatterns/wiki/Creational-Pattern-Usage}
+    - External Object Pool Pattern documentation: U{https://en.wikipedia.org/wiki/Object_pool_pattern}
+    """
+    _ALIGNMENT = 64
+
+    def __init__(self, slab_size, slab_count, mp_context=None):
+        """
+        Initialize a new shared buffer pool, creating its shared memory segment.
+
+        @param slab_size: The size of each slab in bytes.
+        @type slab_size: int
+        @param slab_count: The number of slabs in the pool.
+        @type slab_count: int
+        @param mp_context: The multiprocessing context used to create the pools lock. Defaults to the default context.
+        """
+        self.slab_size = slab_size
+        self.slab_count = slab_count
+        self._available = (mp_context or get_context()).Condition()
+        self._shm = SharedMemory(create=True, size=self._header_size() + slab_size * slab_count)
+        self._creator = getpid()
+        self._owners = self._shm.buf[:slab_count * 8].cast('q')
+
+    def __getstate__(self):
+        return {
+            'slab_size': self.slab_size,
+            'slab_count': self.slab_count,
+            'name': self._shm.name,
+            'available': self._available
+        }
+
+    def __setstate__(self, state):
+        self.slab_size = state['slab_size']
+        self.slab_count = state['slab_count']
+        self._available = state['available']
+        if version_info >= (3, 13):
+            self._shm = SharedMemory(state['name'], track=False)
+        else:
+            self._shm = SharedMemory(state['name'])
+        self._creator = None
+        self._owners = self._shm.buf[:self.slab_count * 8].cast('q')
+
+    def acquire(self, timeout=None):
+        """
+        Acquire a slab from the pool for the calling process.
+
+        If every slab is in use this blocks until a slab is released or reclaimed from a dead process.
+
+        @param timeout: The maximum number of seconds to wait for a slab, or None to wait forever.
+        @type timeout: float
+        @return: The handle of the acquired slab.
+        @raise TimeoutError: If no slab became available before the timeout expired.
+        """
+        with self._available:
+            handle = self._find_free()
+            if handle is None and self.reclaim():
+                handle = self._find_free()
+            if handle is None:
+                if not self._available.wait_for(lambda: self._find_free() is not None or self.reclaim(), timeout):
+                    raise TimeoutError('No slab became available in the pool')
+                handle = self._find_free()
+
+            self._owners[handle] = getpid()
+            return handle
+
+    def try_acquire(self):
+        """
+        Acquire a slab from the pool without blocking.
+
+        @return: The handle of the acquired slab, or None if every slab is in use.
+        """
+        with self._available:
+            handle = self._find_free()
+            if handle is None and self.reclaim():
+                handle = self._find_free()
+            if handle is not None:
+                self._owners[handle] = getpid()
+            return handle
+
+    def release(self, handle):
+        """
+        Release a slab back into the pool.
+
+        @param handle: The handle of the slab to release.
+        @type handle: int
+        @raise ValueError: If the handle is not a slab of this pool, or the slab is already free.
+        """
+        self._check(handle)
+        with self._available:
+            if self._owners[handle] == 0:
+                raise ValueError('Slab {0} was released twice'.format(handle))
+            self._owners[handle] = 0
+            self._available.notify()
+
+    def adopt(self, handle):
+        """
+        Make the calling process the owner of a slab, for when a slab is handed over to another process.
+
+        @param handle: The handle of the slab to adopt.
+        @type handle: int
+        @raise ValueError: If the handle is not a slab of this pool.
+        """
+        self._check(handle)
+        with self._available:
+            self._owners[handle] = getpid()
+
+    def owner(self, handle):
+        """
+        Get the id of the process owning a slab.
+
+        @param handle: The handle of the slab.
+        @type handle: int
+        @return: The owning process id, or None if the slab is free.
+        @raise ValueError: If the handle is not a slab of this pool.
+        """
+        self._check(handle)
+        return self._owners[handle] or None
+
+    def view(self, handle):
+        """
+        Get a memoryview of a slab, without copying it.
+
+        @param handle: The handle of the slab.
+        @type handle: int
+        @return: A writable memoryview of the slab.
+        @raise ValueError: If the handle is not a slab of this pool.
+        """
+        self._check(handle)
+        offset = self._header_size() + handle * self.slab_size
+        return self._shm.buf[offset:offset + self.slab_size]
+
+    def reclaim(self):
+        """
+        Release every slab owned by a process that has exited.
+
+        @return: The number of slabs reclaimed.
+        """
+        with self._available:
+            count = 0
+            for handle, pid in enumerate(self._owners.tolist()):
+                if pid and not _pid_alive(pid):
+                    self._owners[handle] = 0
+                    count += 1
+            if count:
+                self._available.notify(count)
+            return count
+
+    def close(self):
+        """
+        Detach from the shared memory, freeing it if this is the process that created the pool.
+        """
+        self._owners.release()
+        self._shm.close()
+        if self._creator == getpid():
+            self._shm.unlink()
+
+    def _header_size(self):
+        """
+        @return: The size in bytes of the slab ownership table, rounded up to keep slabs aligned.
+        """
+        return -(-self.slab_count * 8 // self._ALIGNMENT) * self._ALIGNMENT
+
+    def _find_free(self):
+        """
+        Find a free slab. Must be called while holding the pools lock.
+
+        @return: The handle of a free slab, or None if every slab is in use.
+        """
+        try:
+            return self._owners.tolist().index(0)
+        except ValueError:
+            return None
+
+    def _check(self, handle):
+        """
+        @raise ValueError: If the handle is not a slab of this pool.
+        """
+        if not 0 <= handle < self.slab_count:
+            raise ValueError('Invalid slab handle {0}'.format(handle))
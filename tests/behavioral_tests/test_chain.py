@@ -1,6 +1,8 @@
+from asyncio import CancelledError, run, sleep
+from time import monotonic
 from unittest import TestCase
 
-from pypattyrn.behavioral.chain import ChainLink, Chain
+from pypattyrn.behavioral.chain import ChainLink, Chain, ChainStats, AsyncChainLink, AsyncChain, NOT_HANDLED
 
 
 class ChainLinkTestCase(TestCase):
@@ -120,7 +122,30 @@ class ChainTestCase(TestCase):
             def fail(self):
                 return 'Fail'
 
+        class MatchChainLink(ChainLink):
+
+            def __init__(self, match):
+                super().__init__()
+                self.match = match
+
+            def handle(self, request):
+                if request == self.match:
+                    return "Handled by {0}".format(self.match)
+                return NOT_HANDLED
+
+        class ListChain(Chain):
+
+            def __init__(self, links, compiled=False, **kwargs):
+                for link, successor in zip(links, links[1:]):
+                    link.set_successor(successor)
+                super().__init__(links[0], compiled, **kwargs)
+
+            def fail(self):
+                return 'Fail'
+
         self.chain_class = ConcreteChain
+        self.match_chain_link_class = MatchChainLink
+        self.list_chain_class = ListChain
 
     def test_success_handle(self):
         """
@@ -143,3 +168,311 @@ class ChainTestCase(TestCase):
         chain = self.chain_class()
 
         self.assertEquals("Fail", chain.handle("foo"))
+
+    def test_compiled_handle(self):
+        """
+        Test the handle method of a compiled chain.
+
+        @raise AssertionError: If the test fails.
+        """
+        chain = self.chain_class()
+        chain.compile()
+
+        self.assertEquals("Handled in chain link one", chain.handle("handle_one"))
+        self.assertEquals("Handled in chain link two", chain.handle("handle_two"))
+        self.assertEquals("Handled in chain link three", chain.handle("handle_three"))
+        self.assertEquals("Fail", chain.handle("foo"))
+        self.assertEquals(3, len(chain._links))
+
+    def test_compiled_long_chain(self):
+        """
+        Test that a compiled chain of many links handles requests without recursing.
+
+        @raise AssertionError: If the test fails.
+        """
+        links = [self.match_chain_link_class(index) for index in range(20000)]
+        chain = self.list_chain_class(links, compiled=True)
+
+        self.assertEquals("Handled by 19999", chain.handle(19999))
+        self.assertEquals("Fail", chain.handle(-1))
+
+    def test_not_handled(self):
+        """
+        Test that a link returning NOT_HANDLED makes an uncompiled chain fail.
+
+        @raise AssertionError: If the test fails.
+        """
+        chain = self.list_chain_class([self.match_chain_link_class('a')])
+
+        self.assertEquals("Handled by a", chain.handle('a'))
+        self.assertEquals("Fail", chain.handle('b'))
+
+    def test_routed_handle(self):
+        """
+        Test that a routed chain only visits the links which might handle a request, in chain order.
+
+        @raise AssertionError: If the test fails.
+        """
+        visited = []
+
+        class KeyedChainLink(self.match_chain_link_class):
+
+            def __init__(self, match, routing_keys=None):
+                super().__init__(match)
+                self.routing_keys = routing_keys
+
+            def handle(self, request):
+                visited.append(self.match)
+                return super().handle(request)
+
+        class TypedChainLink(KeyedChainLink):
+            routing_types = (int,)
+
+        class EvenChainLink(KeyedChainLink):
+
+            def accepts(self, request):
+                return isinstance(request, int) and request % 2 == 0
+
+        links = [KeyedChainLink('a', ('a',)), KeyedChainLink('b', ('b',)), KeyedChainLink('c'),
+                 KeyedChainLink('b2', ('b',)), TypedChainLink(2), EvenChainLink(4)]
+        chain = self.list_chain_class(links, compiled=True)
+
+        self.assertEquals("Handled by b", chain.handle('b'))
+        self.assertEquals(['b'], visited)
+        visited.clear()
+
+        self.assertEquals("Handled by c", chain.handle('c'))
+        self.assertEquals(['c'], visited)
+        visited.clear()
+
+        self.assertEquals("Fail", chain.handle('z'))
+        self.assertEquals(['c'], visited)
+        visited.clear()
+
+        self.assertEquals("Handled by 2", chain.handle(2))
+        self.assertEquals(['c', 2], visited)
+        visited.clear()
+
+        self.assertEquals("Handled by 4", chain.handle(4))
+        self.assertEquals(['c', 2, 4], visited)
+        visited.clear()
+
+        self.assertEquals("Fail", chain.handle(3))
+        self.assertEquals(['c', 2], visited)
+        visited.clear()
+
+        self.assertEquals("Fail", chain.handle(['b']))
+        self.assertEquals(['a', 'b', 'c', 'b2'], visited)
+
+    def test_metrics(self):
+        """
+        Test that a chain with a metrics sink reports every link asked to handle a request.
+
+        @raise AssertionError: If the test fails.
+        """
+        links = [self.match_chain_link_class(match) for match in 'abc']
+        stats = ChainStats()
+        chain = self.list_chain_class(links, metrics=stats)
+
+        self.assertEquals("Handled by b", chain.handle('b'))
+        self.assertEquals("Fail", chain.handle('z'))
+
+        self.assertEquals({links[0]: 2, links[1]: 2, links[2]: 1}, stats.seen)
+        self.assertEquals({links[1]: 1}, stats.handled)
+        self.assertEquals(set(links), set(stats.time))
+
+    def test_adaptive(self):
+        """
+        Test that an adaptive chain moves frequently matching commutative links toward the head of their run.
+
+        @raise AssertionError: If the test fails.
+        """
+        links = [self.match_chain_link_class(match) for match in 'abcde']
+        for link in links[:2] + links[3:]:
+            link.commutative = True
+        chain = self.list_chain_class(links, adaptive=10)
+
+        for request in 'bbbbbeeeea':
+            chain.handle(request)
+
+        self.assertEquals([links[1], links[0], links[2], links[4], links[3]], list(chain._links))
+        self.assertEquals("Handled by a", chain.handle('a'))
+        self.assertEquals("Handled by d", chain.handle('d'))
+
+    def test_cache(self):
+        """
+        Test that a cached chain hands repeated requests straight to the link which handled them.
+
+        @raise AssertionError: If the test fails.
+        """
+        visited = []
+
+        class CountingChainLink(self.match_chain_link_class):
+
+            def handle(self, request):
+                visited.append(self.match)
+                return super().handle(request)
+
+        links = [CountingChainLink(match) for match in 'abc']
+        chain = self.list_chain_class(links, cache_size=2)
+
+        self.assertEquals("Handled by c", chain.handle('c'))
+        visited.clear()
+        self.assertEquals("Handled by c", chain.handle('c'))
+        self.assertEquals(['c'], visited)
+
+        self.assertEquals("Fail", chain.handle('z'))
+        visited.clear()
+        self.assertEquals("Fail", chain.handle('z'))
+        self.assertEquals([], visited)
+
+        chain.handle('b')
+        visited.clear()
+        chain.handle('c')
+        self.assertEquals(['a', 'b', 'c'], visited)
+        self.assertEquals((2, 4), (chain.cache_hits, chain.cache_misses))
+        self.assertEquals(['b', 'c'], list(chain._cache))
+
+        self.assertEquals("Fail", chain.handle(['c']))
+
+    def test_cache_results(self):
+        """
+        Test that a chain caching results returns them without calling the link.
+
+        @raise AssertionError: If the test fails.
+        """
+        links = [self.match_chain_link_class(match) for match in 'ab']
+        chain = self.list_chain_class(links, cache_size=8, cache_results=True)
+
+        self.assertEquals("Handled by b", chain.handle('b'))
+        links[1].match = 'x'
+        self.assertEquals("Handled by b", chain.handle('b'))
+
+        chain.clear_cache()
+        self.assertEquals("Fail", chain.handle('b'))
+
+    def test_handle_many(self):
+        """
+        Test that handle_many passes each link the requests left unhandled as one batch.
+
+        @raise AssertionError: If the test fails.
+        """
+        batches = []
+
+        class BatchChainLink(self.match_chain_link_class):
+
+            def handle_batch(self, requests):
+                batches.append((self.match, list(requests)))
+                return super().handle_batch(requests)
+
+        links = [BatchChainLink(match) for match in 'abc']
+        chain = self.list_chain_class(links, compiled=True)
+
+        self.assertEquals(["Handled by b", "Handled by a", "Fail", "Handled by c", "Handled by a"],
+                          chain.handle_many(iter('bazca')))
+        self.assertEquals([('a', list('bazca')), ('b', list('bzc')), ('c', list('zc'))], batches)
+        self.assertEquals(["Fail"], self.chain_class().handle_many(['foo']))
+
+    def test_routed_handle_many(self):
+        """
+        Test that handle_many on a routed chain only batches requests for the links which might handle them.
+
+        @raise AssertionError: If the test fails.
+        """
+        batches = []
+
+        class KeyedChainLink(self.match_chain_link_class):
+
+            def __init__(self, match, routing_keys=None):
+                super().__init__(match)
+                self.routing_keys = routing_keys
+
+            def handle_batch(self, requests):
+                batches.append((self.match, list(requests)))
+                return super().handle_batch(requests)
+
+        links = [KeyedChainLink('a', ('a',)), KeyedChainLink('b', ('b',)), KeyedChainLink('c')]
+        chain = self.list_chain_class(links, compiled=True)
+
+        self.assertEquals(["Handled by b", "Handled by c", "Fail"], chain.handle_many(['b', 'c', 'z']))
+        self.assertEquals([('b', ['b']), ('c', ['c', 'z'])], batches)
+
+
+class AsyncChainTestCase(TestCase):
+    """
+    Unit testing class for the AsyncChain class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+        self.cancelled = []
+
+        class SleepChainLink(AsyncChainLink):
+
+            def __init__(test_link, match, delay, successor=None):
+                super().__init__()
+                test_link.match = match
+                test_link.delay = delay
+                test_link.set_successor(successor)
+
+            async def handle(test_link, request):
+                try:
+                    await sleep(test_link.delay)
+                except CancelledError:
+                    self.cancelled.append(test_link.match)
+                    raise
+                if request == test_link.match:
+                    return "Handled by {0}".format(test_link.match)
+                return await test_link.successor_handle(request)
+
+        class ConcreteAsyncChain(AsyncChain):
+
+            def fail(self):
+                return 'Fail'
+
+        self.link_class = SleepChainLink
+        self.chain_class = ConcreteAsyncChain
+
+    def test_handle(self):
+        """
+        Test the handle method awaiting links in chain order.
+
+        @raise AssertionError: If the test fails.
+        """
+        chain = self.chain_class(self.link_class('a', 0, self.link_class('b', 0)))
+
+        self.assertEquals("Handled by a", run(chain.handle('a')))
+        self.assertEquals("Handled by b", run(chain.handle('b')))
+        self.assertEquals("Fail", run(chain.handle('c')))
+
+    def test_timeout(self):
+        """
+        Test that a link which times out is treated as not handling the request.
+
+        @raise AssertionError: If the test fails.
+        """
+        slow = self.link_class('a', 1, self.link_class('a', 0))
+        slow.timeout = 0.01
+        chain = self.chain_class(slow)
+
+        self.assertEquals("Handled by a", run(chain.handle('a')))
+        self.assertEquals(['a'], self.cancelled)
+
+    def test_speculate(self):
+        """
+        Test that speculative mode runs links concurrently, keeps chain order and cancels the links left running.
+
+        @raise AssertionError: If the test fails.
+        """
+        links = self.link_class('a', 0.2, self.link_class('b', 0.2, self.link_class('b', 0, self.link_class('d', 1))))
+        chain = self.chain_class(links, speculate=2)
+
+        start = monotonic()
+        self.assertEquals("Handled by b", run(chain.handle('b')))
+        self.assertLess(monotonic() - start, 0.38)
+
+        chain = self.chain_class(self.link_class('a', 0.05, self.link_class('b', 1)), speculate=1)
+        self.assertEquals("Handled by a", run(chain.handle('a')))
+        self.assertEquals(['b'], self.cancelled)
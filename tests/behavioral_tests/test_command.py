@@ -1,6 +1,65 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from threading import Barrier, Event
+from time import sleep
 from unittest import TestCase
+from unittest.mock import patch
 
-from pypattyrn.behavioral.command import Receiver, Command, Invoker
+from pypattyrn.behavioral.command import Receiver, Command, Invoker, CommandJournal, ThreadedInvoker, \
+    CommandScheduler, ScheduledCommand, ParallelInvoker, MacroCommand
+
+
+class Counter(Receiver):
+    """
+    Receiver with state for journal tests, defined at module level so it can be pickled.
+    """
+    def __init__(self):
+        self.value = 0
+
+    def add(self, amount):
+        self.value += amount
+        return self.value
+
+
+class AddCommand(Command):
+    """
+    Command for journal tests, defined at module level so it can be pickled.
+    """
+    def __init__(self, receiver, amount):
+        super().__init__(receiver)
+        self.amount = amount
+
+    def execute(self):
+        return self._receiver.action('add', self.amount)
+
+    def unexecute(self):
+        return self._receiver.action('add', -self.amount)
+
+
+class SetCommand(Command):
+    """
+    Command capturing the previous value of its receiver when executed, encoded as a delta.
+    """
+    def __init__(self, receiver, value):
+        super().__init__(receiver)
+        self.value = value
+        self.previous = None
+
+    def execute(self):
+        self.previous = self._receiver.value
+        self._receiver.value = self.value
+
+    def unexecute(self):
+        self._receiver.value = self.previous
+
+    def to_delta(self):
+        return self.value, self.previous
+
+    @classmethod
+    def from_delta(cls, receiver, delta):
+        command = cls(receiver, delta[0])
+        command.previous = delta[1]
+        return command
 
 
 class ReceiverTestCase(TestCase):
@@ -40,6 +99,48 @@ class ReceiverTestCase(TestCase):
         with self.assertRaises(AttributeError):
             self.thermostat.action('foo')
 
+    def test_action_table(self):
+        """
+        Test that actions are dispatched through the class action table, respecting overrides.
+
+        @raise AssertionError: If the test fails.
+        """
+        class SmartThermostat(self.thermostat.__class__):
+            def raise_temp(self, amount):
+                return "Temperature smartly raised by {0} degrees".format(amount)
+
+            lower_temp = None
+
+        thermostat = SmartThermostat()
+        thermostat.reset = lambda: "Temperature reset"
+
+        self.assertIn('raise_temp', SmartThermostat._actions)
+        self.assertNotIn('lower_temp', SmartThermostat._actions)
+        self.assertEquals("Temperature smartly raised by 5 degrees", thermostat.action('raise_temp', 5))
+        self.assertEquals("Temperature reset", thermostat.action('reset'))
+        with self.assertRaises(TypeError):
+            thermostat.action('lower_temp', 5)
+
+    def test_action_table_patched(self):
+        """
+        Test that actions follow methods patched on the class or shadowed on the instance.
+
+        @raise AssertionError: If the test fails.
+        """
+        thermostat_class = self.thermostat.__class__
+
+        class SmartThermostat(thermostat_class):
+            pass
+
+        thermostat = SmartThermostat()
+        with patch.object(thermostat_class, 'raise_temp', return_value='patched'):
+            self.assertEquals('patched', thermostat.action('raise_temp', 5))
+            self.assertEquals('patched', self.thermostat.action('raise_temp', 5))
+        self.assertEquals("Temperature raised by 5 degrees", thermostat.action('raise_temp', 5))
+
+        thermostat.raise_temp = lambda amount: 'shadowed'
+        self.assertEquals('shadowed', thermostat.action('raise_temp', 5))
+
 
 class CommandTestCase(TestCase):
     """
@@ -140,7 +241,21 @@ class InvokerTestCase(TestCase):
             def __init__(self):
                 super().__init__([LowerTempCommand, RaiseTempCommand])
 
+        class CheckpointCommand(Command):
+            def __init__(self, commands):
+                super().__init__(None)
+                self.commands = commands
+
+            def execute(self):
+                return [command.execute() for command in self.commands]
+
+            def unexecute(self):
+                return [command.unexecute() for command in reversed(self.commands)]
+
         self.worker = Worker()
+        self.valid_commands = [LowerTempCommand, RaiseTempCommand]
+        self.checkpoint_command_class = CheckpointCommand
+        self.raise_temp_command_class = RaiseTempCommand
         self.receiver = Thermostat()
         self.lower_temp_command = LowerTempCommand(self.receiver)
         self.raise_temp_command = RaiseTempCommand(self.receiver)
@@ -178,6 +293,19 @@ class InvokerTestCase(TestCase):
         with self.assertRaises(AttributeError):
             self.worker.execute(TurnOnLightCommand(Light))
 
+    def test_subclass_execute(self):
+        """
+        Test that subclasses of valid commands are accepted.
+
+        @raise AssertionError: If the test fails.
+        """
+        class BigRaiseTempCommand(self.raise_temp_command_class):
+            pass
+
+        self.assertEquals("Temperature raised by 50 degrees",
+                          self.worker.execute(BigRaiseTempCommand(self.receiver, 50)))
+        self.assertTrue(self.worker._validated[BigRaiseTempCommand])
+
     def test_undo(self):
         """
         Test the undo method.
@@ -189,3 +317,778 @@ class InvokerTestCase(TestCase):
         self.assertIn(self.raise_temp_command, self.worker._history)
         self.assertEquals("Temperature lowered by 5 degrees", self.worker.undo())
         self.assertNotIn(self.raise_temp_command, self.worker._history)
+
+    def test_max_history(self):
+        """
+        Test that the oldest commands are evicted from a history bounded by count.
+
+        @raise AssertionError: If the test fails.
+        """
+        evicted = []
+        invoker = Invoker(self.valid_commands, max_history=2, on_evict=evicted.append)
+        commands = [self.raise_temp_command_class(self.receiver, amount) for amount in range(4)]
+        for command in commands:
+            invoker.execute(command)
+
+        self.assertEquals(commands[:2], evicted)
+        self.assertEquals(commands[2:], list(invoker._history))
+        self.assertEquals("Temperature lowered by 3 degrees", invoker.undo())
+
+    def test_max_history_bytes(self):
+        """
+        Test that the oldest commands are evicted from a history bounded by estimated size.
+
+        @raise AssertionError: If the test fails.
+        """
+        evicted = []
+        invoker = Invoker(self.valid_commands, max_history_bytes=25, on_evict=evicted.append,
+                          size_of=lambda command: 10)
+        commands = [self.raise_temp_command_class(self.receiver, amount) for amount in range(4)]
+        for command in commands:
+            invoker.execute(command)
+
+        self.assertEquals(commands[:2], evicted)
+        self.assertEquals(20, invoker._history_bytes)
+        invoker.undo()
+        self.assertEquals(10, invoker._history_bytes)
+
+    def test_compactor(self):
+        """
+        Test that the oldest commands are merged into a checkpoint instead of being evicted.
+
+        @raise AssertionError: If the test fails.
+        """
+        def compactor(commands):
+            merged = []
+            for command in commands:
+                merged.extend(getattr(command, 'commands', [command]))
+            return self.checkpoint_command_class(merged)
+
+        invoker = Invoker(self.valid_commands, max_history=2, compactor=compactor)
+        for amount in range(4):
+            invoker.execute(self.raise_temp_command_class(self.receiver, amount))
+
+        self.assertEquals(2, len(invoker._history))
+        self.assertEquals("Temperature lowered by 3 degrees", invoker.undo())
+        self.assertEquals(["Temperature lowered by {0} degrees".format(amount) for amount in (2, 1, 0)],
+                          invoker.undo())
+
+    def test_execute_batch(self):
+        """
+        Test executing a batch which is undone as a single entry.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        invoker = Invoker([AddCommand])
+
+        self.assertEquals([1, 3, 6], invoker.execute_batch([AddCommand(counter, amount) for amount in (1, 2, 3)]))
+        self.assertEquals(1, len(invoker._history))
+        self.assertEquals([3, 1, 0], invoker.undo())
+        self.assertEquals(0, counter.value)
+
+    def test_execute_batch_rollback(self):
+        """
+        Test that a failing batch is rolled back and not recorded.
+
+        @raise AssertionError: If the test fails.
+        """
+        class FailCommand(AddCommand):
+            def execute(self):
+                raise ValueError()
+
+        counter = Counter()
+        invoker = Invoker([AddCommand, FailCommand])
+
+        with self.assertRaises(ValueError):
+            invoker.execute_batch([AddCommand(counter, 1), AddCommand(counter, 2), FailCommand(counter, 3)])
+        self.assertEquals(0, counter.value)
+        self.assertEquals(0, len(invoker._history))
+
+    def test_execute_batch_empty(self):
+        """
+        Test that an empty batch adds nothing to the history.
+
+        @raise AssertionError: If the test fails.
+        """
+        invoker = Invoker([AddCommand])
+
+        self.assertEquals([], invoker.execute_batch([]))
+        self.assertEquals(0, len(invoker._history))
+
+    def test_execute_batch_invalid(self):
+        """
+        Test that a batch containing an invalid command is rejected before anything runs.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        with self.assertRaises(AttributeError):
+            self.worker.execute_batch([AddCommand(counter, 1), self.raise_temp_command])
+        self.assertEquals(0, counter.value)
+
+    def test_execute_batch_coalesce(self):
+        """
+        Test that adjacent commands are merged where they allow it.
+
+        @raise AssertionError: If the test fails.
+        """
+        class MergingAddCommand(AddCommand):
+            def coalesce(self, other):
+                if isinstance(other, MergingAddCommand) and other._receiver is self._receiver:
+                    return MergingAddCommand(self._receiver, self.amount + other.amount)
+                return None
+
+        counter = Counter()
+        invoker = Invoker([AddCommand, MergingAddCommand])
+        commands = [MergingAddCommand(counter, 1), MergingAddCommand(counter, 2), AddCommand(counter, 3),
+                    MergingAddCommand(counter, 4)]
+
+        self.assertEquals([3, 6, 10], invoker.execute_batch(commands))
+        self.assertEquals(3, len(invoker._history[0].commands))
+
+    def test_redo(self):
+        """
+        Test redoing undone commands.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        invoker = Invoker([AddCommand])
+        invoker.execute(AddCommand(counter, 1))
+        invoker.execute(AddCommand(counter, 2))
+        invoker.undo()
+        invoker.undo()
+
+        self.assertEquals(1, invoker.redo())
+        self.assertEquals(3, invoker.redo())
+        with self.assertRaises(IndexError):
+            invoker.redo()
+        self.assertEquals(1, invoker.undo())
+
+    def test_execute_clears_redo(self):
+        """
+        Test that executing a new command discards undone commands.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        invoker = Invoker([AddCommand])
+        invoker.execute(AddCommand(counter, 1))
+        invoker.undo()
+        invoker.execute(AddCommand(counter, 5))
+
+        with self.assertRaises(IndexError):
+            invoker.redo()
+        self.assertEquals(5, counter.value)
+
+    def test_delta_history(self):
+        """
+        Test that commands supporting deltas are stored as deltas and rebuilt to undo and redo.
+
+        @raise AssertionError: If the test fails.
+        """
+        class DeltaAddCommand(AddCommand):
+            def to_delta(self):
+                return self.amount
+
+            @classmethod
+            def from_delta(cls, receiver, delta):
+                return cls(receiver, delta)
+
+        counter = Counter()
+        invoker = Invoker([DeltaAddCommand])
+        invoker.execute(DeltaAddCommand(counter, 3))
+
+        self.assertEquals((DeltaAddCommand, counter, 3), invoker._history[0])
+        self.assertEquals(0, invoker.undo())
+        self.assertEquals((DeltaAddCommand, counter, 3), invoker._redo[0])
+        self.assertEquals(3, invoker.redo())
+
+    def test_delta_captured_state(self):
+        """
+        Test that deltas are encoded after executing, so they hold the state a command captured.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        counter.value = 7
+        invoker = Invoker([SetCommand])
+        invoker.execute(SetCommand(counter, 3))
+
+        self.assertEquals((SetCommand, counter, (3, 7)), invoker._history[0])
+        invoker.undo()
+        self.assertEquals(7, counter.value)
+        invoker.redo()
+        self.assertEquals(3, counter.value)
+        invoker.undo()
+        self.assertEquals(7, counter.value)
+
+
+class ThreadedInvokerTestCase(TestCase):
+    """
+    Unit testing class for the ThreadedInvoker class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+
+        class Recorder(Receiver):
+            def __init__(self):
+                self.calls = []
+
+            def record(self, value, wait=None):
+                if wait is not None:
+                    wait.wait(5)
+                self.calls.append(value)
+                return value
+
+        class RecordCommand(Command):
+            def __init__(self, receiver, value, wait=None):
+                super().__init__(receiver)
+                self.value = value
+                self.wait = wait
+
+            def execute(self):
+                return self._receiver.action('record', self.value, self.wait)
+
+            def unexecute(self):
+                return self._receiver.action('record', -self.value)
+
+        self.recorder_class = Recorder
+        self.record_command_class = RecordCommand
+        self.invoker = ThreadedInvoker([RecordCommand], max_workers=4, max_queued=4)
+
+    def tearDown(self):
+        """
+        Shut down the invokers workers.
+        """
+        self.invoker.shutdown()
+
+    def test_execute(self):
+        """
+        Test that commands for one receiver run in order and resolve their futures.
+
+        @raise AssertionError: If the test fails.
+        """
+        recorder = self.recorder_class()
+        futures = [self.invoker.execute(self.record_command_class(recorder, value)) for value in range(20)]
+
+        self.assertEquals(list(range(20)), [future.result(5) for future in futures])
+        self.assertEquals(list(range(20)), recorder.calls)
+        self.assertEquals(20, len(self.invoker._history))
+
+    def test_parallel_receivers(self):
+        """
+        Test that a blocked receiver does not hold up commands for other receivers.
+
+        @raise AssertionError: If the test fails.
+        """
+        blocked, free = self.recorder_class(), self.recorder_class()
+        release = Event()
+        blocked_future = self.invoker.execute(self.record_command_class(blocked, 1, release))
+        queued_future = self.invoker.execute(self.record_command_class(blocked, 2))
+
+        self.assertEquals(3, self.invoker.execute(self.record_command_class(free, 3)).result(5))
+        self.assertFalse(queued_future.done())
+        release.set()
+        self.assertEquals(2, queued_future.result(5))
+        self.assertEquals([1, 2], blocked.calls)
+        self.assertTrue(blocked_future.done())
+
+    def test_backpressure(self):
+        """
+        Test that executing blocks once the queue is full.
+
+        @raise AssertionError: If the test fails.
+        """
+        recorder = self.recorder_class()
+        release = Event()
+        futures = [self.invoker.execute(self.record_command_class(recorder, value, release)) for value in range(4)]
+
+        with self.assertRaises(TimeoutError):
+            self.invoker.execute(self.record_command_class(recorder, 4), timeout=0.01)
+        release.set()
+        self.assertEquals(list(range(4)), [future.result(5) for future in futures])
+        self.assertEquals(4, self.invoker.execute(self.record_command_class(recorder, 4), timeout=5).result(5))
+
+    def test_undo(self):
+        """
+        Test that undo runs after pending commands for the same receiver.
+
+        @raise AssertionError: If the test fails.
+        """
+        recorder = self.recorder_class()
+        self.invoker.execute(self.record_command_class(recorder, 1))
+
+        self.assertEquals(-1, self.invoker.undo().result(5))
+        self.assertEquals(1, self.invoker.redo().result(5))
+        self.assertEquals([1, -1, 1], recorder.calls)
+
+    def test_invalid_execute(self):
+        """
+        Test executing a command the invoker can not handle.
+
+        @raise AssertionError: If the test fails.
+        """
+        with self.assertRaises(AttributeError):
+            self.invoker.execute(AddCommand(Counter(), 1))
+
+    def test_undo_redo_queue_full(self):
+        """
+        Test that an undo or redo which times out waiting for the queue leaves the history and redo stack unchanged.
+
+        @raise AssertionError: If the test fails.
+        """
+        invoker = ThreadedInvoker([self.record_command_class], max_workers=2, max_queued=1)
+        recorder = self.recorder_class()
+        release = Event()
+        invoker.execute(self.record_command_class(recorder, 1)).result(5)
+        blocked = invoker.execute(self.record_command_class(recorder, 2, release))
+
+        with self.assertRaises(TimeoutError):
+            invoker.undo(timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            invoker.redo(timeout=0.05)
+        self.assertEquals(2, len(invoker._history))
+        self.assertEquals(0, len(invoker._redo))
+
+        release.set()
+        blocked.result(5)
+        invoker.undo().result(5)
+        invoker.redo().result(5)
+        invoker.shutdown()
+        self.assertEquals([1, 2, -2, 2], recorder.calls)
+
+    def test_failed_command_not_recorded(self):
+        """
+        Test that a command which fails on the workers is taken back out of the history.
+
+        @raise AssertionError: If the test fails.
+        """
+        class FailCommand(self.record_command_class):
+            def execute(self):
+                raise ValueError('fail')
+
+        recorder = self.recorder_class()
+        self.invoker.execute(self.record_command_class(recorder, 1)).result(5)
+        self.assertIsInstance(self.invoker.execute(FailCommand(recorder, 2)).exception(5), ValueError)
+
+        self.assertEquals(1, len(self.invoker._history))
+        self.invoker.undo().result(5)
+        self.assertEquals([1, -1], recorder.calls)
+
+    def test_execute_after_shutdown(self):
+        """
+        Test that a command the executor refuses fails its future without blocking its lane or staying in the history.
+
+        @raise AssertionError: If the test fails.
+        """
+        recorder = self.recorder_class()
+        self.invoker.execute(self.record_command_class(recorder, 1)).result(5)
+        self.invoker.shutdown()
+
+        for value in range(8):
+            future = self.invoker.execute(self.record_command_class(recorder, value), timeout=1)
+            self.assertIsInstance(future.exception(5), RuntimeError)
+        self.assertIsInstance(self.invoker.undo(timeout=1).exception(5), RuntimeError)
+
+        self.assertEquals(1, len(self.invoker._history))
+        self.assertEquals(0, len(self.invoker._redo))
+        self.assertEquals({}, self.invoker._lanes)
+
+    def test_execute_batch(self):
+        """
+        Test that a batch is queued in its receivers lane and undone as one entry.
+
+        @raise AssertionError: If the test fails.
+        """
+        recorder = self.recorder_class()
+        release = Event()
+        first = self.invoker.execute(self.record_command_class(recorder, 1, release))
+        batch = self.invoker.execute_batch([self.record_command_class(recorder, 2),
+                                            self.record_command_class(recorder, 3)])
+        release.set()
+
+        self.assertEquals([2, 3], batch.result(5))
+        self.assertEquals(1, first.result(5))
+        self.assertEquals(2, len(self.invoker._history))
+        self.invoker.undo().result(5)
+        self.assertEquals([1, 2, 3, -3, -2], recorder.calls)
+
+        self.assertEquals([], self.invoker.execute_batch([]).result(5))
+        self.assertEquals(1, len(self.invoker._history))
+        with self.assertRaises(ValueError):
+            self.invoker.execute_batch([self.record_command_class(recorder, 4),
+                                        self.record_command_class(self.recorder_class(), 5)])
+
+    def test_delta_captured_state(self):
+        """
+        Test that deltas are encoded once the queued call has run, so they hold the state a command captured.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        counter.value = 7
+        invoker = ThreadedInvoker([SetCommand], max_workers=2)
+        invoker.execute(SetCommand(counter, 3)).result(5)
+
+        self.assertEquals((SetCommand, counter, (3, 7)), invoker._history[0])
+        invoker.undo().result(5)
+        self.assertEquals(7, counter.value)
+        self.assertEquals((SetCommand, counter, (3, 7)), invoker._redo[0])
+        invoker.redo().result(5)
+        self.assertEquals(3, counter.value)
+        invoker.undo().result(5)
+        self.assertEquals(7, counter.value)
+        invoker.shutdown()
+
+
+class ParallelInvokerTestCase(TestCase):
+    """
+    Unit testing class for the ParallelInvoker class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+        self.invoker = ParallelInvoker([AddCommand], max_workers=4)
+
+    def tearDown(self):
+        """
+        Shut down the invokers workers.
+        """
+        self.invoker.shutdown()
+
+    def test_parallel_batch(self):
+        """
+        Test that commands for different receivers run at the same time.
+
+        @raise AssertionError: If the test fails.
+        """
+        barrier = Barrier(2, timeout=5)
+
+        class MeetCommand(AddCommand):
+            def execute(self):
+                barrier.wait()
+                return super().execute()
+
+        one, two = Counter(), Counter()
+
+        self.assertEquals([1, 2], self.invoker.execute_batch([MeetCommand(one, 1), MeetCommand(two, 2)]))
+        self.assertEquals(1, len(self.invoker._history))
+
+    def test_conflicting_batch(self):
+        """
+        Test that conflicting commands run in batch order and are undone in reverse order.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        commands = [AddCommand(counter, amount) for amount in range(1, 21)]
+
+        results = self.invoker.execute_batch(commands)
+
+        self.assertEquals([sum(range(1, amount + 1)) for amount in range(1, 21)], results)
+        self.assertEquals(list(reversed(results[:-1])) + [0], self.invoker.undo())
+
+    def test_conflict_graph(self):
+        """
+        Test the conflict graph built from declared reads and writes.
+
+        @raise AssertionError: If the test fails.
+        """
+        class ResourceCommand(AddCommand):
+            def __init__(self, reads, writes):
+                super().__init__(None, 0)
+                self.read_resources = reads
+                self.write_resources = writes
+
+            def reads(self):
+                return self.read_resources
+
+            def writes(self):
+                return self.write_resources
+
+        commands = [ResourceCommand([], ['a']), ResourceCommand(['a'], []), ResourceCommand(['a'], ['b']),
+                    ResourceCommand([], ['a']), ResourceCommand(['c'], ['c'])]
+        dependents, blockers = ParallelInvoker._conflict_graph(commands)
+
+        self.assertEquals([{1, 2, 3}, {3}, {3}, set(), set()], dependents)
+        self.assertEquals([0, 1, 1, 3, 0], blockers)
+
+    def test_macro_batch(self):
+        """
+        Test that a macro command conflicts with the commands writing the receivers of its commands.
+
+        @raise AssertionError: If the test fails.
+        """
+        class SlowCommand(AddCommand):
+            def execute(self):
+                sleep(0.05)
+                return super().execute()
+
+        counter = Counter()
+        macro = MacroCommand([SlowCommand(counter, 1)])
+
+        invoker = ParallelInvoker([AddCommand, MacroCommand], max_workers=4)
+        try:
+            self.assertEquals([counter], list(macro.writes()))
+            self.assertEquals([[1], 3], invoker.execute_batch([macro, AddCommand(counter, 2)]))
+        finally:
+            invoker.shutdown()
+
+    def test_batch_rollback(self):
+        """
+        Test that finished commands are unexecuted when a command of the batch fails.
+
+        @raise AssertionError: If the test fails.
+        """
+        class FailCommand(AddCommand):
+            def execute(self):
+                raise ValueError()
+
+        one, two = Counter(), Counter()
+        with self.assertRaises(ValueError):
+            self.invoker.execute_batch([AddCommand(one, 1), AddCommand(two, 2), FailCommand(two, 3),
+                                        AddCommand(two, 4)])
+
+        self.assertEquals(0, one.value)
+        self.assertEquals(0, two.value)
+        self.assertEquals(0, len(self.invoker._history))
+
+
+class CommandSchedulerTestCase(TestCase):
+    """
+    Unit testing class for the CommandScheduler class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+        self.counter = Counter()
+        self.invoker = Invoker([AddCommand])
+
+    def test_wheel(self):
+        """
+        Test that commands fire on their due tick across every level of the wheel and the overflow.
+
+        @raise AssertionError: If the test fails.
+        """
+        scheduler = CommandScheduler(self.invoker, wheel_size=4, levels=2)
+        due_ticks = [1, 3, 4, 5, 15, 16, 17, 40, 63]
+        for due in due_ticks:
+            with scheduler._lock:
+                scheduler._insert(ScheduledCommand(AddCommand(self.counter, due), due, None))
+
+        fired = []
+        for tick in range(1, 70):
+            fired.extend((tick, scheduled.command.amount) for scheduled, due in scheduler._advance())
+
+        self.assertEquals([(due, due) for due in due_ticks], fired)
+
+    def test_interval_and_cancel(self):
+        """
+        Test repeating and cancelling commands on the wheel.
+
+        @raise AssertionError: If the test fails.
+        """
+        scheduler = CommandScheduler(self.invoker, wheel_size=4, levels=2)
+        with scheduler._lock:
+            repeating = ScheduledCommand(AddCommand(self.counter, 1), 2, 5)
+            cancelled = ScheduledCommand(AddCommand(self.counter, 2), 10, None)
+            scheduler._insert(repeating)
+            scheduler._insert(cancelled)
+        self.assertTrue(scheduler.cancel(cancelled))
+        self.assertFalse(scheduler.cancel(cancelled))
+
+        fired = []
+        for tick in range(1, 18):
+            fired.extend(tick for scheduled, due in scheduler._advance())
+
+        self.assertEquals([2, 7, 12, 17], fired)
+        self.assertTrue(scheduler.cancel(repeating))
+
+    def test_schedule(self):
+        """
+        Test that scheduled commands are executed by the schedulers thread.
+
+        @raise AssertionError: If the test fails.
+        """
+        scheduler = CommandScheduler(self.invoker, tick=0.001)
+        scheduler.start()
+        scheduler.schedule(AddCommand(self.counter, 1), 0.01)
+        repeating = scheduler.schedule(AddCommand(self.counter, 10), 0, interval=0.005)
+        for i in range(500):
+            if self.counter.value >= 31:
+                break
+            sleep(0.01)
+        scheduler.cancel(repeating)
+        scheduler.stop()
+
+        self.assertGreaterEqual(self.counter.value, 31)
+        self.assertEquals(1, self.counter.value % 10)
+        self.assertGreaterEqual(scheduler.fired, 4)
+        self.assertGreaterEqual(scheduler.lag_max, scheduler.lag_mean)
+
+    def test_threaded_error(self):
+        """
+        Test that a command failing on the workers of a ThreadedInvoker is passed to on_error.
+
+        @raise AssertionError: If the test fails.
+        """
+        class FailCommand(AddCommand):
+            def execute(self):
+                raise ValueError()
+
+        failed = Event()
+        errors = []
+
+        def on_error(command, error):
+            errors.append((command, error))
+            failed.set()
+
+        invoker = ThreadedInvoker([AddCommand], max_workers=2)
+        scheduler = CommandScheduler(invoker, tick=0.001, on_error=on_error)
+        scheduler.start()
+        command = FailCommand(self.counter, 1)
+        scheduler.schedule(command, 0.005)
+        self.assertTrue(failed.wait(5))
+        scheduler.stop()
+        invoker.shutdown()
+
+        self.assertEquals(1, len(errors))
+        self.assertIs(command, errors[0][0])
+        self.assertIsInstance(errors[0][1], ValueError)
+
+    def test_invalid_schedule(self):
+        """
+        Test scheduling a command the invoker can not handle.
+
+        @raise AssertionError: If the test fails.
+        """
+        scheduler = CommandScheduler(self.invoker)
+        with self.assertRaises(AttributeError):
+            scheduler.schedule(object(), 1)
+        with self.assertRaises(ValueError):
+            CommandScheduler(self.invoker, wheel_size=5)
+
+
+class CommandJournalTestCase(TestCase):
+    """
+    Unit testing class for the CommandJournal class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, 'commands.journal')
+
+    def tearDown(self):
+        """
+        Remove the journal files.
+        """
+        self.directory.cleanup()
+
+    def test_replay(self):
+        """
+        Test rebuilding a receiver by replaying the journal.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        invoker = Invoker([AddCommand], journal=CommandJournal(self.path, sync_every=2))
+        for amount in (1, 2, 3):
+            invoker.execute(AddCommand(counter, amount))
+        invoker._journal.close()
+
+        rebuilt = Invoker([AddCommand], journal=CommandJournal(self.path)).replay(Counter())
+
+        self.assertEquals(6, counter.value)
+        self.assertEquals(6, rebuilt.value)
+
+    def test_replay_torn_tail(self):
+        """
+        Test that a partially written final frame is discarded on replay.
+
+        @raise AssertionError: If the test fails.
+        """
+        journal = CommandJournal(self.path)
+        counter = Counter()
+        for amount in (1, 2):
+            journal.append(AddCommand(counter, amount))
+        journal.close()
+        with open(self.path, 'ab') as journal_file:
+            journal_file.write(b'\x10\x00\x00')
+
+        journal = CommandJournal(self.path)
+        self.assertEquals(3, journal.replay(Counter()).value)
+        journal.append(AddCommand(counter, 4))
+        journal.close()
+        self.assertEquals(7, CommandJournal(self.path).replay(Counter()).value)
+
+    def test_snapshot(self):
+        """
+        Test that replay starts from the latest snapshot.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        invoker = Invoker([AddCommand], journal=CommandJournal(self.path, snapshot_every=2))
+        for amount in (1, 2, 3):
+            invoker.execute(AddCommand(counter, amount))
+        invoker._journal.close()
+
+        journal = CommandJournal(self.path)
+        empty = Counter()
+        rebuilt = journal.replay(empty)
+
+        self.assertEquals(3, len(list(journal._read(0))))
+        self.assertIsNot(empty, rebuilt)
+        self.assertEquals(6, rebuilt.value)
+
+    def test_replay_undo_redo(self):
+        """
+        Test that undone and redone commands are journaled so replay rebuilds the same state.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        invoker = Invoker([AddCommand], journal=CommandJournal(self.path))
+        invoker.execute(AddCommand(counter, 5))
+        invoker.undo()
+        invoker.redo()
+        invoker.execute_batch([AddCommand(counter, 1), AddCommand(counter, 2)])
+        invoker.undo()
+        invoker._journal.close()
+
+        self.assertEquals(5, counter.value)
+        self.assertEquals(5, CommandJournal(self.path).replay(Counter()).value)
+
+    def test_single_receiver(self):
+        """
+        Test that a journal rejects commands for a second receiver before they are executed.
+
+        @raise AssertionError: If the test fails.
+        """
+        counter = Counter()
+        other = Counter()
+        invoker = Invoker([AddCommand], journal=CommandJournal(self.path, snapshot_every=1))
+        invoker.execute(AddCommand(counter, 1))
+
+        with self.assertRaises(ValueError):
+            invoker.execute(AddCommand(other, 2))
+        with self.assertRaises(ValueError):
+            invoker.execute_batch([AddCommand(counter, 2), AddCommand(other, 2)])
+        with self.assertRaises(ValueError):
+            invoker._journal.snapshot(other)
+        invoker._journal.close()
+
+        self.assertEquals((1, 0), (counter.value, other.value))
+        self.assertEquals(1, CommandJournal(self.path).replay(Counter()).value)
@@ -1,5 +1,8 @@
+from asyncio import run, sleep
+from threading import get_ident
+from time import monotonic, sleep as blocking_sleep
 from unittest import TestCase
-from pypattyrn.behavioral.mediator import Mediator
+from pypattyrn.behavioral.mediator import Mediator, AsyncMediator
 
 
 class MediatorTestCase(TestCase):
@@ -33,10 +36,10 @@ class MediatorTestCase(TestCase):
         """
         mediator = Mediator()
         mediator.connect('set_dog_sound', self.dog.set_sound)
-        self.assertEquals([self.dog.set_sound], mediator.signals['set_dog_sound'])
+        self.assertEquals((self.dog.set_sound,), mediator.signals['set_dog_sound'])
 
         mediator.connect('set_cat_sound', self.cat.set_sound)
-        self.assertEquals([self.cat.set_sound], mediator.signals['set_cat_sound'])
+        self.assertEquals((self.cat.set_sound,), mediator.signals['set_cat_sound'])
 
     def test_disconnect(self):
         """
@@ -46,10 +49,10 @@ class MediatorTestCase(TestCase):
         """
         mediator = Mediator()
         mediator.connect('set_dog_sound', self.dog.set_sound)
-        self.assertEquals([self.dog.set_sound], mediator.signals['set_dog_sound'])
+        self.assertEquals((self.dog.set_sound,), mediator.signals['set_dog_sound'])
 
         mediator.disconnect('set_dog_sound', self.dog.set_sound)
-        self.assertEquals([], mediator.signals['set_dog_sound'])
+        self.assertNotIn('set_dog_sound', mediator.signals)
 
     def test_signal(self):
         """
@@ -91,7 +94,176 @@ class MediatorTestCase(TestCase):
             mediator.signal('foo')
         except:
             raise AssertionError()
+        self.assertEquals({}, mediator.signals)
 
+    def test_connect_during_signal(self):
+        """
+        Test that connecting and disconnecting handlers while a signal is sent does not affect that signal.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = Mediator()
+        calls = []
+
+        def first(sound):
+            calls.append('first')
+            mediator.disconnect('sound', second)
+            mediator.connect('sound', third)
+
+        def second(sound):
+            calls.append('second')
+
+        def third(sound):
+            calls.append('third')
+
+        mediator.connect('sound', first)
+        mediator.connect('sound', second)
+        mediator.signal('sound', 'woof')
+
+        self.assertEquals(['first', 'second'], calls)
+        self.assertEquals((first, third), mediator.signals['sound'])
+
+    def test_topic_patterns(self):
+        """
+        Test connecting receivers to topic patterns with * and # wildcards.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = Mediator()
+        calls = []
+
+        mediator.connect('orders.#', lambda: calls.append('orders.#'))
+        mediator.connect('orders.*.created', lambda: calls.append('orders.*.created'))
+        mediator.connect('orders.eu.created', lambda: calls.append('orders.eu.created'))
+        mediator.connect('#.created', lambda: calls.append('#.created'))
+
+        mediator.signal('orders.eu.created')
+        self.assertEquals(['orders.eu.created', 'orders.#', 'orders.*.created', '#.created'], calls)
+
+        calls.clear()
+        mediator.signal('orders')
+        mediator.signal('orders.eu.us.created')
+        mediator.signal('users.created')
+        mediator.signal('users')
+        self.assertEquals(['orders.#', 'orders.#', '#.created', '#.created'], calls)
+        self.assertEquals({'orders.eu.created'}, set(mediator.signals))
+
+    def test_topic_cache(self):
+        """
+        Test that the cached handlers of a signal are invalidated when receivers connect or disconnect.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = Mediator(cache_size=2)
+        mediator.connect('orders.*', self.dog.set_sound)
+        mediator.signal('orders.eu', 'woof')
+        self.assertEquals('woof', self.dog.sound)
+
+        mediator.connect('orders.#', self.cat.set_sound)
+        mediator.signal('orders.eu', 'meow')
+        self.assertEquals('meow', self.cat.sound)
+
+        mediator.disconnect('orders.*', self.dog.set_sound)
+        mediator.signal('orders.eu', 'purr')
+        self.assertEquals('meow', self.dog.sound)
+
+        for name in ('orders.a', 'orders.b', 'orders.c'):
+            mediator.signal(name, name)
+        self.assertEquals(['orders.b', 'orders.c'], list(mediator._resolved))
+
+    def test_topic_prune(self):
+        """
+        Test that disconnecting the last receiver of a pattern removes its nodes from the topic trie.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = Mediator()
+        mediator.connect('orders.#', self.dog.set_sound)
+        mediator.connect('orders.*.created', self.cat.set_sound)
+
+        mediator.disconnect('orders.*.created', self.cat.set_sound)
+        self.assertEquals({'#'}, set(mediator._topics.children['orders'].children))
+
+        mediator.disconnect('orders.#', self.dog.set_sound)
+        self.assertEquals({}, mediator._topics.children)
+
+    def test_async_topic_cache_size(self):
+        """
+        Test that AsyncMediator passes its cache size on, a size of 0 disabling the cache.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = AsyncMediator(cache_size=0)
+        mediator.connect('orders.*', str.upper)
+
+        self.assertEquals(['A'], run(mediator.signal('orders.a', 'a')))
+        self.assertEquals({}, mediator._resolved)
+
+
+class AsyncMediatorTestCase(TestCase):
+    """
+    Unit testing class for the AsyncMediator class.
+    """
+    def test_signal(self):
+        """
+        Test that signal awaits coroutine handlers concurrently and collects the results of every handler.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = AsyncMediator()
+
+        async def slow(sound):
+            await sleep(0.2)
+            return 'slow ' + sound
+
+        async def slower(sound):
+            await sleep(0.25)
+            return 'slower ' + sound
+
+        mediator.connect('sound', slow)
+        mediator.connect('sound', slower)
+        mediator.connect('sound', str.upper)
+
+        start = monotonic()
+        self.assertEquals(['slow woof', 'slower woof', 'WOOF'], run(mediator.signal('sound', 'woof')))
+        self.assertLess(monotonic() - start, 0.4)
+        self.assertEquals([], run(mediator.signal('foo')))
+        self.assertEquals({'sound': (slow, slower, str.upper)}, mediator.signals)
+
+    def test_blocking(self):
+        """
+        Test that handlers connected as blocking run in the executor.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = AsyncMediator()
+
+        def block():
+            blocking_sleep(0.01)
+            return get_ident()
+
+        mediator.connect('block', block, blocking=True)
+        mediator.connect('block', get_ident)
+
+        executor_thread, loop_thread = run(mediator.signal('block'))
+        self.assertNotEquals(executor_thread, loop_thread)
+
+        mediator.disconnect('block', block)
+        self.assertEquals((get_ident,), mediator.signals['block'])
+
+    def test_timeout(self):
+        """
+        Test that a signal whose handlers take too long raises TimeoutError.
+
+        @raise AssertionError: If the test fails.
+        """
+        mediator = AsyncMediator(timeout=5)
 
+        async def hang():
+            await sleep(5)
 
+        mediator.connect('hang', hang)
+        mediator.set_timeout('hang', 0.01)
 
+        with self.assertRaises(TimeoutError):
+            run(mediator.signal('hang'))
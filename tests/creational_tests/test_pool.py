@@ -1,7 +1,32 @@
+from asyncio import run, gather, create_task, Event as AsyncEvent, sleep as async_sleep
 from unittest import TestCase
 
 from copy import deepcopy
-from pypattyrn.creational.pool import Reusable, Pool
+from gc import collect
+from multiprocessing import Process
+from os import _exit
+from threading import Thread
+from time import sleep
+from pypattyrn.creational.pool import Reusable, Pool, AsyncPool, SharedBufferPool, FixedGrowth, ExponentialGrowth, \
+    TargetUtilizationGrowth, PoolStats
+
+
+def fill_slab(buffer_pool, handle):
+    """
+    Fill a slab of a shared buffer pool from a child process.
+    """
+    view = buffer_pool.view(handle)
+    view[:] = b'x' * len(view)
+    view.release()
+    buffer_pool.close()
+
+
+def crash_holding_slab(buffer_pool):
+    """
+    Acquire a slab of a shared buffer pool and exit without releasing it.
+    """
+    buffer_pool.acquire()
+    _exit(1)
 
 
 class ReusableTestCase(TestCase):
@@ -51,6 +76,102 @@ class ReusableTestCase(TestCase):
         self.assertEquals("woof", reset_sound_two)
         self.assertEquals(original_state, final_state)
 
+    def test_reset_state_hook(self):
+        """
+        Test that a reset_state hook is used instead of restoring a memento.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Buffer(Reusable):
+            def __init__(self):
+                self.data = bytearray(8)
+                super().__init__()
+
+            def reset_state(self):
+                self.data[:] = bytes(8)
+
+        buffer = Buffer()
+        data = buffer.data
+        buffer.data[0] = 1
+        buffer.reset()
+
+        self.assertIsNone(buffer.memento)
+        self.assertIs(data, buffer.data)
+        self.assertEquals(bytearray(8), buffer.data)
+
+    def test_reset_immutable_fields(self):
+        """
+        Test that fields declared immutable are restored without being deep copied.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Toy(object):
+            copies = 0
+
+            def __deepcopy__(self, memo):
+                Toy.copies += 1
+                return Toy()
+
+        class Dog(Reusable):
+            immutable_fields = ('toy',)
+
+            def __init__(self):
+                self.toy = Toy()
+                self.sound = 'woof'
+                super().__init__()
+
+        dog = Dog()
+        toy = dog.memento.state['toy']
+        dog.sound = 'bark'
+        dog.reset()
+        dog.reset()
+
+        self.assertEquals(1, Toy.copies)
+        self.assertIs(toy, dog.toy)
+        self.assertEquals('woof', dog.sound)
+
+    def test_reset_mutable_fields(self):
+        """
+        Test that mutable fields are restored from a copy so the saved state is never shared.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Dog(Reusable):
+            def __init__(self):
+                self.tricks = ['sit']
+                super().__init__()
+
+        dog = Dog()
+        dog.tricks.append('roll')
+        dog.reset()
+        dog.tricks.append('beg')
+        dog.reset()
+
+        self.assertEquals(['sit'], dog.tricks)
+
+    def test_reset_frozenset_fields(self):
+        """
+        Test that frozensets are deep copied unless declared immutable, since they can hold mutable objects.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Toy(object):
+            def __init__(self):
+                self.squeaks = 0
+
+        class Dog(Reusable):
+            def __init__(self):
+                self.toys = frozenset((Toy(),))
+                super().__init__()
+
+        dog = Dog()
+        for i in range(2):
+            for toy in dog.toys:
+                toy.squeaks += 1
+            dog.reset()
+
+        self.assertEquals([0], [toy.squeaks for toy in dog.toys])
+
 
 class PoolTestCase(TestCase):
     """
@@ -71,6 +192,7 @@ class PoolTestCase(TestCase):
             def __init__(self):
                 super(DogPool, self).__init__(Dog, 'woof')
 
+        self.dog_class = Dog
         self.dog_pool_class = DogPool
 
     def test_acquire(self):
@@ -110,3 +232,683 @@ class PoolTestCase(TestCase):
         self.assertEquals(dog_one.sound, dog_two.sound)
         self.assertEquals(dog_three.sound, dog_four.sound)
         self.assertEquals(dog_one.sound, dog_four.sound)
+
+    def test_bounded_try_acquire(self):
+        """
+        Test the try_acquire method on a bounded pool.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=2)
+
+        dog_one = dog_pool.try_acquire()
+        dog_two = dog_pool.try_acquire()
+        self.assertIsNotNone(dog_one)
+        self.assertIsNotNone(dog_two)
+        self.assertIsNone(dog_pool.try_acquire())
+
+        dog_pool.release(dog_one)
+        self.assertEquals(id(dog_one), id(dog_pool.try_acquire()))
+
+    def test_bounded_acquire_timeout(self):
+        """
+        Test that acquire times out on an exhausted bounded pool.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=1)
+        dog_pool.acquire()
+
+        with self.assertRaises(TimeoutError):
+            dog_pool.acquire(timeout=0.01)
+
+    def test_bounded_acquire_blocks(self):
+        """
+        Test that acquire on an exhausted bounded pool waits for a release.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=1)
+        dog_one = dog_pool.acquire()
+
+        def release_later():
+            sleep(0.05)
+            dog_pool.release(dog_one)
+
+        thread = Thread(target=release_later)
+        thread.start()
+        dog_two = dog_pool.acquire(timeout=5)
+        thread.join()
+
+        self.assertEquals(id(dog_one), id(dog_two))
+
+    def test_bounded_concurrent_acquire(self):
+        """
+        Test that concurrent acquires never create more objects than max_size.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=3)
+        seen = set()
+
+        def work():
+            for i in range(200):
+                dog = dog_pool.acquire(timeout=5)
+                seen.add(id(dog))
+                dog_pool.release(dog)
+
+        threads = [Thread(target=work) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(len(seen), 3)
+        self.assertLessEqual(dog_pool._size, 3)
+        self.assertEquals(dog_pool._size, len(dog_pool.reusables))
+
+    def test_invalid_size(self):
+        """
+        Test that a min_size larger than max_size is rejected.
+
+        @raise AssertionError: If the test fails.
+        """
+        with self.assertRaises(ValueError):
+            Pool(self.dog_class, 'woof', min_size=5, max_size=2)
+
+    def test_growth_policies(self):
+        """
+        Test the number of objects each growth policy creates.
+
+        @raise AssertionError: If the test fails.
+        """
+        self.assertEquals(3, FixedGrowth(3).grow_by(10, 10))
+        self.assertEquals(10, ExponentialGrowth().grow_by(10, 10))
+        self.assertEquals(1, ExponentialGrowth().grow_by(0, 0))
+        self.assertEquals(4, TargetUtilizationGrowth(0.5).grow_by(6, 4))
+
+    def test_exponential_growth(self):
+        """
+        Test a pool growing exponentially when it runs out of objects.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', growth=ExponentialGrowth())
+        dogs = [dog_pool.acquire() for i in range(5)]
+
+        self.assertEquals(8, dog_pool._size)
+        self.assertEquals(3, len(dog_pool.reusables))
+        self.assertEquals(5, len(set(id(dog) for dog in dogs)))
+
+    def test_evict_idle(self):
+        """
+        Test evicting idle objects down to the minimum size.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', min_size=1)
+        dog_pool.idle_ttl = 0
+        dogs = [dog_pool.acquire() for i in range(4)]
+        for dog in dogs:
+            dog_pool.release(dog)
+
+        self.assertEquals(4, dog_pool.evict_idle())
+        self.assertEquals(1, dog_pool._size)
+        self.assertEquals([dogs[-1]], dog_pool.reusables)
+
+    def test_evict_idle_keeps_recent(self):
+        """
+        Test that objects idle for less than the idle ttl are not evicted.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', min_size=0, idle_ttl=60)
+        dog_pool.release(dog_pool.acquire())
+        dog_pool.close()
+
+        self.assertEquals(0, dog_pool.evict_idle())
+        self.assertEquals(2, len(dog_pool.reusables))
+
+    def test_prewarm(self):
+        """
+        Test that the pool is pre-warmed in the background up to its low water mark.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', min_size=0, max_size=6, low_water=3)
+        dogs = [dog_pool.acquire(timeout=5) for i in range(3)]
+        for i in range(500):
+            with dog_pool._available:
+                if len(dog_pool.reusables) >= 3:
+                    break
+            sleep(0.01)
+        dog_pool.close()
+
+        self.assertEquals(3, len(dog_pool.reusables))
+        self.assertEquals(6, dog_pool._size)
+        self.assertEquals(3, len(set(id(dog) for dog in dogs)))
+
+    def test_metrics(self):
+        """
+        Test the metrics sent to a PoolStats sink.
+
+        @raise AssertionError: If the test fails.
+        """
+        stats = PoolStats()
+        dog_pool = Pool(self.dog_class, 'woof', metrics=stats)
+        dogs = [dog_pool.acquire() for i in range(3)]
+        for dog in dogs:
+            dog_pool.release(dog)
+        dog_pool.acquire()
+
+        self.assertEquals(3, stats.hits)
+        self.assertEquals(1, stats.misses)
+        self.assertEquals(0.75, stats.hit_rate)
+        self.assertEquals(3, stats.high_water)
+        self.assertEquals(4, sum(stats.wait_histogram))
+        self.assertEquals(3, stats.checkouts)
+        self.assertGreaterEqual(stats.checkout_max, 0)
+
+    def test_debug_leaks(self):
+        """
+        Test that debug mode reports objects that are never released.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', debug=True)
+        dog_one = dog_pool.acquire()
+        dog_two = dog_pool.acquire()
+        dog_pool.release(dog_two)
+
+        leaks = dog_pool.leaks()
+        self.assertEquals(1, len(leaks))
+        self.assertIs(dog_one, leaks[0][0])
+        self.assertEquals('test_debug_leaks', leaks[0][1][-1].name)
+
+        with self.assertWarns(ResourceWarning):
+            del dog_one, leaks
+            collect()
+        self.assertEquals([], dog_pool.leaks())
+
+    def test_thread_cache(self):
+        """
+        Test that released objects are kept in the releasing threads cache.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', thread_cache=1)
+        dog_one = dog_pool.acquire()
+        dog_two = dog_pool.acquire()
+        dog_one.sound = 'bark'
+        dog_pool.release(dog_one)
+        dog_pool.release(dog_two)
+
+        self.assertEquals([dog_two], dog_pool.reusables)
+        self.assertIs(dog_one, dog_pool.acquire())
+        self.assertEquals('woof', dog_one.sound)
+        self.assertIs(dog_two, dog_pool.acquire())
+
+    def test_thread_cache_thread_exit(self):
+        """
+        Test that a threads cached objects are returned to the shared pool when the thread exits.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=2, thread_cache=2)
+        dogs = []
+
+        def work():
+            dogs.extend([dog_pool.acquire(), dog_pool.acquire()])
+            for dog in dogs:
+                dog_pool.release(dog)
+            self.assertEquals([], dog_pool.reusables)
+
+        thread = Thread(target=work)
+        thread.start()
+        thread.join()
+        collect()
+
+        self.assertEquals(set(map(id, dogs)), set(map(id, dog_pool.reusables)))
+        self.assertIsNotNone(dog_pool.acquire(timeout=1))
+
+    def test_reusable_kwargs(self):
+        """
+        Test passing reusables keyword arguments which clash with pool options.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Logger(Reusable):
+            def __init__(self, name, debug=False):
+                self.name = name
+                self.debug = debug
+                super().__init__()
+
+        logger_pool = Pool(Logger, name='app', reusable_kwargs={'debug': True})
+        logger = logger_pool.acquire()
+
+        self.assertEquals(('app', True), (logger.name, logger.debug))
+        self.assertFalse(logger_pool.debug)
+
+    def test_double_release(self):
+        """
+        Test that releasing an object twice raises ValueError and leaves the pool usable.
+
+        @raise AssertionError: If the test fails.
+        """
+        for thread_cache in (0, 2):
+            dog_pool = Pool(self.dog_class, 'woof', thread_cache=thread_cache)
+            dog = dog_pool.acquire()
+            dog_pool.release(dog)
+            with self.assertRaises(ValueError):
+                dog_pool.release(dog)
+
+            dogs = [dog_pool.acquire() for i in range(3)]
+            self.assertEquals(3, len(set(map(id, dogs))))
+
+    def test_thread_cache_bounded(self):
+        """
+        Test that a thread waiting on a bounded pool takes the objects idle in another threads cache.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=1, thread_cache=1)
+        dog = dog_pool.acquire()
+        dog_pool.release(dog)
+        acquired = []
+
+        thread = Thread(target=lambda: acquired.append(dog_pool.acquire(timeout=0.3)))
+        thread.start()
+        thread.join()
+
+        self.assertEquals([dog], acquired)
+        dog_pool.release(dog)
+        self.assertIs(dog, dog_pool.acquire(timeout=0.3))
+
+    def test_thread_cache_evict_idle(self):
+        """
+        Test that objects left idle in a threads cache are evicted.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', min_size=0, idle_ttl=60, thread_cache=2)
+        dogs = [dog_pool.acquire(), dog_pool.acquire()]
+        for dog in dogs:
+            dog_pool.release(dog)
+        dog_pool.idle_ttl = 0
+
+        self.assertEquals(2, dog_pool.evict_idle())
+        self.assertEquals(0, dog_pool._size)
+        self.assertEquals([], dog_pool._thread_reusables())
+        dog_pool.close()
+
+    def test_thread_cache_concurrent(self):
+        """
+        Test many threads acquiring and releasing through their caches.
+
+        @raise AssertionError: If the test fails.
+        """
+        dog_pool = Pool(self.dog_class, 'woof', max_size=4, thread_cache=1)
+        errors = []
+
+        def work():
+            for i in range(500):
+                dog = dog_pool.acquire(timeout=5)
+                if dog.sound != 'woof':
+                    errors.append(dog.sound)
+                dog.sound = 'bark'
+                dog_pool.release(dog)
+
+        threads = [Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals([], errors)
+        self.assertLessEqual(dog_pool._size, 4)
+
+    def test_validate_after(self):
+        """
+        Test that stale objects failing validation are discarded and replaced.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Connection(Reusable):
+            def __init__(self):
+                self.healthy = True
+                super().__init__()
+
+            def validate(self):
+                return self.healthy
+
+        stats = PoolStats()
+        pool = Pool(Connection, min_size=2, max_size=2, validate_after=0, metrics=stats)
+        broken = pool.reusables[-1]
+        broken.healthy = False
+        broken.memento = broken.commit()
+
+        connection = pool.acquire(timeout=5)
+        pool.release(connection)
+        for i in range(500):
+            with pool._available:
+                if len(pool.reusables) == 2:
+                    break
+            sleep(0.01)
+        pool.close()
+
+        self.assertIsNot(broken, connection)
+        self.assertTrue(connection.healthy)
+        self.assertEquals(1, stats.validation_failures)
+        self.assertEquals(2, pool._size)
+        self.assertNotIn(broken, pool.reusables)
+
+    def test_validate_after_raises(self):
+        """
+        Test that an object whose validate raises is discarded like one failing validation.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Connection(Reusable):
+            def __init__(self):
+                self.stale = False
+                super().__init__()
+
+            def validate(self):
+                if self.stale:
+                    raise ConnectionError('stale')
+                return True
+
+        pool = Pool(Connection, max_size=1, validate_after=0)
+        broken = pool.acquire(timeout=1)
+        broken.stale = True
+        broken.memento = broken.commit()
+        pool.release(broken)
+
+        connection = pool.acquire(timeout=1)
+        pool.close()
+
+        self.assertIsNot(broken, connection)
+        self.assertEquals(1, pool._size)
+
+    def test_validate_after_skips_recent(self):
+        """
+        Test that objects idle for less than validate_after are not validated.
+
+        @raise AssertionError: If the test fails.
+        """
+        class Connection(Reusable):
+            validations = 0
+
+            def validate(self):
+                Connection.validations += 1
+                return True
+
+        pool = Pool(Connection, validate_after=60)
+        pool.release(pool.acquire())
+        pool.close()
+
+        self.assertEquals(0, Connection.validations)
+
+
+class AsyncPoolTestCase(TestCase):
+    """
+    Unit testing class for the AsyncPool class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+
+        class Dog(Reusable):
+            def __init__(self, sound):
+                self.sound = sound
+                super().__init__()
+
+        self.dog_class = Dog
+
+    def test_acquire_release(self):
+        """
+        Test the acquire and release methods.
+
+        @raise AssertionError: If the test fails.
+        """
+        async def scenario():
+            dog_pool = AsyncPool(self.dog_class, 'woof')
+            dog_one = await dog_pool.acquire()
+            dog_two = await dog_pool.acquire()
+            dog_one.sound = 'meow'
+            dog_pool.release(dog_one)
+            dog_three = await dog_pool.acquire()
+            return dog_one, dog_two, dog_three
+
+        dog_one, dog_two, dog_three = run(scenario())
+
+        self.assertNotEquals(id(dog_one), id(dog_two))
+        self.assertEquals(id(dog_one), id(dog_three))
+        self.assertEquals('woof', dog_three.sound)
+
+    def test_lease(self):
+        """
+        Test that lease releases its object when the block exits.
+
+        @raise AssertionError: If the test fails.
+        """
+        async def scenario():
+            dog_pool = AsyncPool(self.dog_class, 'woof', max_size=1)
+            async with dog_pool.lease() as dog:
+                dog.sound = 'bark'
+            return dog, await dog_pool.acquire(timeout=1)
+
+        dog_one, dog_two = run(scenario())
+
+        self.assertIs(dog_one, dog_two)
+        self.assertEquals('woof', dog_two.sound)
+
+    def test_fifo_waiters(self):
+        """
+        Test that waiters on a bounded pool are served in the order they started waiting.
+
+        @raise AssertionError: If the test fails.
+        """
+        order = []
+
+        async def scenario():
+            dog_pool = AsyncPool(self.dog_class, 'woof', max_size=1)
+            dog = await dog_pool.acquire()
+
+            async def waiter(name):
+                async with dog_pool.lease():
+                    order.append(name)
+                    await async_sleep(0)
+
+            tasks = gather(waiter('one'), waiter('two'), waiter('three'))
+            await async_sleep(0)
+            dog_pool.release(dog)
+            await tasks
+
+        run(scenario())
+
+        self.assertEquals(['one', 'two', 'three'], order)
+
+    def test_acquire_timeout(self):
+        """
+        Test that acquire times out on an exhausted bounded pool.
+
+        @raise AssertionError: If the test fails.
+        """
+        async def scenario():
+            dog_pool = AsyncPool(self.dog_class, 'woof', max_size=1)
+            dog = await dog_pool.acquire()
+            with self.assertRaises(TimeoutError):
+                await dog_pool.acquire(timeout=0.01)
+            dog_pool.release(dog)
+            return dog_pool
+
+        dog_pool = run(scenario())
+
+        self.assertEquals(1, len(dog_pool.reusables))
+        self.assertEquals(0, len(dog_pool._waiters))
+
+    def test_async_factory(self):
+        """
+        Test creating objects with an async factory.
+
+        @raise AssertionError: If the test fails.
+        """
+        async def create_dog(sound):
+            await async_sleep(0)
+            return self.dog_class(sound.upper())
+
+        async def scenario():
+            dog_pool = AsyncPool(self.dog_class, 'woof', max_size=2, factory=create_dog)
+            return await gather(dog_pool.acquire(), dog_pool.acquire()), dog_pool
+
+        dogs, dog_pool = run(scenario())
+
+        self.assertEquals(['WOOF', 'WOOF'], [dog.sound for dog in dogs])
+        self.assertEquals(2, dog_pool._size)
+
+    def test_async_factory_failure(self):
+        """
+        Test that the slot of a failed creation is handed to a waiter rather than to a newcomer.
+
+        @raise AssertionError: If the test fails.
+        """
+        sizes = []
+
+        async def scenario():
+            gate = AsyncEvent()
+
+            async def create_dog(sound):
+                sizes.append(dog_pool._size)
+                if len(sizes) == 1:
+                    await gate.wait()
+                    raise ConnectionError('unreachable')
+                await async_sleep(0)
+                return self.dog_class(sound)
+
+            dog_pool = AsyncPool(self.dog_class, 'woof', max_size=1, factory=create_dog)
+            first = create_task(dog_pool.acquire())
+            await async_sleep(0)
+            waiter = create_task(dog_pool.acquire())
+            await async_sleep(0)
+            gate.set()
+            newcomer = create_task(dog_pool.acquire(timeout=0.05))
+            return await gather(first, waiter, newcomer, return_exceptions=True), dog_pool
+
+        (first, waiter, newcomer), dog_pool = run(scenario())
+
+        self.assertIsInstance(first, ConnectionError)
+        self.assertEquals('woof', waiter.sound)
+        self.assertIsInstance(newcomer, TimeoutError)
+        self.assertEquals([1, 1], sizes)
+        self.assertEquals(1, dog_pool._size)
+
+
+class SharedBufferPoolTestCase(TestCase):
+    """
+    Unit testing class for the SharedBufferPool class.
+    """
+
+    def setUp(self):
+        """
+        Initialize testing data.
+        """
+        self.buffer_pool = SharedBufferPool(16, 2)
+
+    def tearDown(self):
+        """
+        Free the shared memory.
+        """
+        self.buffer_pool.close()
+
+    def test_acquire_release(self):
+        """
+        Test the acquire and release methods.
+
+        @raise AssertionError: If the test fails.
+        """
+        handle_one = self.buffer_pool.acquire()
+        handle_two = self.buffer_pool.acquire()
+
+        self.assertNotEquals(handle_one, handle_two)
+        self.assertIsNone(self.buffer_pool.try_acquire())
+        with self.assertRaises(TimeoutError):
+            self.buffer_pool.acquire(timeout=0.01)
+
+        self.buffer_pool.release(handle_one)
+        self.assertIsNone(self.buffer_pool.owner(handle_one))
+        self.assertEquals(handle_one, self.buffer_pool.acquire())
+
+    def test_double_release(self):
+        """
+        Test that releasing a free slab raises an error and leaves the slab free.
+
+        @raise AssertionError: If the test fails.
+        """
+        handle = self.buffer_pool.acquire()
+        self.buffer_pool.release(handle)
+
+        with self.assertRaises(ValueError):
+            self.buffer_pool.release(handle)
+        self.assertIsNone(self.buffer_pool.owner(handle))
+
+    def test_view(self):
+        """
+        Test that views of a slab share its memory.
+
+        @raise AssertionError: If the test fails.
+        """
+        handle = self.buffer_pool.acquire()
+        view_one = self.buffer_pool.view(handle)
+        view_two = self.buffer_pool.view(handle)
+        view_one[:3] = b'abc'
+
+        self.assertEquals(16, len(view_one))
+        self.assertEquals(b'abc', bytes(view_two[:3]))
+
+        view_one.release()
+        view_two.release()
+
+    def test_invalid_handle(self):
+        """
+        Test using a handle that is not a slab of the pool.
+
+        @raise AssertionError: If the test fails.
+        """
+        with self.assertRaises(ValueError):
+            self.buffer_pool.view(2)
+        with self.assertRaises(ValueError):
+            self.buffer_pool.release(-1)
+
+    def test_cross_process(self):
+        """
+        Test that a child process writes to a slab without copying it back.
+
+        @raise AssertionError: If the test fails.
+        """
+        handle = self.buffer_pool.acquire()
+        process = Process(target=fill_slab, args=(self.buffer_pool, handle))
+        process.start()
+        process.join()
+
+        view = self.buffer_pool.view(handle)
+        self.assertEquals(b'x' * 16, bytes(view))
+        view.release()
+
+    def test_reclaim(self):
+        """
+        Test that slabs held by a crashed process are reclaimed.
+
+        @raise AssertionError: If the test fails.
+        """
+        handle = self.buffer_pool.acquire()
+        process = Process(target=crash_holding_slab, args=(self.buffer_pool,))
+        process.start()
+        process.join()
+
+        self.assertEquals(process.pid, self.buffer_pool.owner(1 - handle))
+        self.assertEquals(1, self.buffer_pool.reclaim())
+        self.assertIsNone(self.buffer_pool.owner(1 - handle))
+        self.assertEquals(1 - handle, self.buffer_pool.acquire(timeout=1))